@@ -29,8 +29,8 @@ __data__ = ('html_basics/*',)
 __scripts__ = ()
 
 
-__all__ = ['Record', 'DictTree']
+__all__ = ['Record', 'RecordedCall', 'DictTree']
 
-from .recording import Record
+from .recording import Record, RecordedCall
 from .formatting import DictTree
 from .table import Table
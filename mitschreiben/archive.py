@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+#
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+
+from array import array
+import mmap
+import struct
+import sys
+
+from six.moves import cPickle as pickle
+
+from .formatting import DictTree
+
+__all__ = ['RecordArchive']
+
+_MAGIC = b'MITSCHR\x01'
+_HEADER = struct.Struct('=8sc7x8Q')
+_FLOAT, _INT, _OBJECT = 0, 1, 2
+_MIN_INT, _MAX_INT = -2 ** 63, 2 ** 63
+
+# memoryview.cast is not available on Python 2, where 'L' is the typecode of 8 byte unsigned ints (on 64 bit Unix)
+_CAST = hasattr(memoryview, 'cast')
+_UINT64 = 'Q' if _CAST else 'L'
+
+
+def _pad(f):
+    f.write(b'\x00' * (-f.tell() % 8))
+    return f.tell()
+
+
+class _StructArray(object):
+    """A stand-in for memoryview.cast on Python 2: the numbers of a struct format character in a buffer, which are
+    packed and unpacked on access."""
+
+    def __init__(self, buffer, typecode, start, stop):
+        self._buffer = buffer
+        self._typecode = typecode
+        self._item = struct.Struct('=' + typecode)
+        self._start = start
+        self._len = (stop - start) // self._item.size
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        size = self._item.size
+        if isinstance(i, slice):
+            start, stop, _ = i.indices(self._len)
+            return _StructArray(self._buffer, self._typecode, self._start + start * size,
+                                self._start + max(start, stop) * size)
+        return self._item.unpack_from(self._buffer, self._start + i * size)[0]
+
+    def __setitem__(self, i, value):
+        self._item.pack_into(self._buffer, self._start + i * self._item.size, value)
+
+    def tolist(self):
+        return list(struct.unpack_from('={}{}'.format(self._len, self._typecode), self._buffer, self._start))
+
+    def release(self):
+        pass
+
+
+def _cast(view, typecode, start=0, stop=None):
+    """returns the numbers of a typecode in view[start:stop] without copying them"""
+    if _CAST:
+        return view[start:stop].cast(typecode)
+    return _StructArray(view, typecode, start, len(view) if stop is None else stop)
+
+
+class RecordArchive(object):
+    """
+    A binary file of record entries which is read via mmap, so a large archive can be queried by key prefix without
+    loading the whole file. In contrast to the csv files the values are stored lossless: floats and ints as 8 byte
+    numbers, any other value pickled.
+
+    The file holds the interned key parts, the keys as arrays of part ids sorted by those ids, so all keys with a
+    common prefix are adjacent, and a block of values. The arrays use the native byte order of the writing machine.
+
+    .. code::
+
+        Record().to_archive('record.bin')
+
+        with RecordArchive('record.bin') as archive:
+            tree = archive['Foo(bar).price']    # a DictTree of all entries below that prefix
+
+    Like a DictTree the archive returns the value of a key or, for a partial key, a DictTree of the truncated keys.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap) if _CAST else self._mmap
+        magic, byteorder, n, parts, key_offsets, ids, kinds, slots, blobs, end = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError('{} is not a record archive.'.format(filename))
+        if byteorder != sys.byteorder[0].encode():
+            raise ValueError('{} was written with a different byte order.'.format(filename))
+        self._len = n
+        self._parts = pickle.loads(view[parts:key_offsets])
+        self._part_ids = dict((part, i) for i, part in enumerate(self._parts))
+        self._blob_offset = blobs
+        self._views = [view if _CAST else None,
+                       _cast(view, 'Q', key_offsets, ids),
+                       _cast(view, 'I', ids, kinds),
+                       _cast(view, 'B', kinds, kinds + n),
+                       _cast(view, 'd', slots, blobs),
+                       _cast(view, 'q', slots, blobs),
+                       view[blobs:end] if _CAST else None]
+        self._view, self._key_offsets, self._ids, self._kinds, self._floats, self._ints, self._blobs = self._views
+
+    @staticmethod
+    def write(entries, filename):
+        """writes a mapping of tuple keys and values, e.g. |Record().entries| or a DictTree, to a file"""
+        part_ids, parts, rows = dict(), list(), list()
+        for key, value in entries.items():
+            ids = list()
+            for part in key:
+                i = part_ids.get(part)
+                if i is None:
+                    i = part_ids[part] = len(parts)
+                    parts.append(part)
+                ids.append(i)
+            rows.append((tuple(ids), value))
+        rows.sort(key=lambda row: row[0])
+
+        key_offsets, ids, kinds = array(_UINT64, [0]), array('I'), array('B')
+        # each value takes an 8 byte slot holding a float, an int or the offset of a pickled value
+        slots = bytearray(8 * len(rows))
+        slot_view = memoryview(slots) if _CAST else slots
+        slot_floats, slot_ints = _cast(slot_view, 'd'), _cast(slot_view, 'q')
+        blobs = list()
+        blob_offset = 0
+        for i, (key_ids, value) in enumerate(rows):
+            ids.extend(key_ids)
+            key_offsets.append(len(ids))
+            value_type = type(value)
+            if value_type is float:
+                kinds.append(_FLOAT)
+                slot_floats[i] = value
+            elif value_type is int and _MIN_INT <= value < _MAX_INT:
+                kinds.append(_INT)
+                slot_ints[i] = value
+            else:
+                blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                kinds.append(_OBJECT)
+                slot_ints[i] = blob_offset
+                blobs.append(blob)
+                blob_offset += len(blob)
+        slot_floats.release()
+        slot_ints.release()
+
+        with open(filename, 'wb') as f:
+            f.write(b'\x00' * _HEADER.size)
+            offsets = [_pad(f)]
+            f.write(pickle.dumps(parts, pickle.HIGHEST_PROTOCOL))
+            for block in (key_offsets, ids, kinds):
+                offsets.append(_pad(f))
+                block.tofile(f)
+            offsets.append(_pad(f))
+            f.write(slots)
+            offsets.append(_pad(f))
+            f.write(b''.join(blobs))
+            offsets.append(f.tell())
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC, sys.byteorder[0].encode(), len(rows), *offsets))
+
+    def close(self):
+        for view in reversed(self._views):
+            if view is not None:
+                view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._len
+
+    def _key_ids(self, i):
+        return tuple(self._ids[self._key_offsets[i]:self._key_offsets[i + 1]].tolist())
+
+    def _key(self, i):
+        parts = self._parts
+        return tuple(parts[j] for j in self._key_ids(i))
+
+    def _value(self, i):
+        kind = self._kinds[i]
+        if kind == _FLOAT:
+            return self._floats[i]
+        if kind == _INT:
+            return self._ints[i]
+        if _CAST:
+            return pickle.loads(self._blobs[self._ints[i]:])
+        # pickle does not load from a buffer on Python 2, but reads from the mmap at the offset of the value
+        self._mmap.seek(self._blob_offset + self._ints[i])
+        return pickle.load(self._mmap)
+
+    def _range(self, prefix_ids):
+        """returns the first and the last but one position of the keys starting with prefix_ids"""
+        n = len(prefix_ids)
+        lo, hi = 0, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_ids(mid) < prefix_ids:
+                lo = mid + 1
+            else:
+                hi = mid
+        start, hi = lo, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_ids(mid)[:n] <= prefix_ids:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    def __getitem__(self, tpl):
+        if not isinstance(tpl, tuple):
+            tpl = (tpl,)
+        try:
+            prefix_ids = tuple(self._part_ids[part] for part in tpl)
+        except (KeyError, TypeError):
+            raise KeyError(tpl)
+        start, stop = self._range(prefix_ids)
+        if start == stop:
+            raise KeyError(tpl)
+        if self._key_ids(start) == prefix_ids:
+            return self._value(start)
+        n = len(tpl)
+        return DictTree((self._key(i)[n:], self._value(i)) for i in range(start, stop))
+
+    def __contains__(self, key):
+        try:
+            key_ids = tuple(self._part_ids[part] for part in key)
+        except (KeyError, TypeError):
+            return False
+        start, stop = self._range(key_ids)
+        return start < stop and self._key_ids(start) == key_ids
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._key(i)
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(self._key(i), self._value(i)) for i in range(self._len)]
+
+    def to_dict_tree(self):
+        """loads all entries into a DictTree"""
+        return DictTree(self.items())
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+#
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+
+__all__ = ['RecordedArray']
+
+
+class RecordedArray(object):
+    """
+    An array recorded by |Record().record_array()|. It refers to the recorded one-dimensional sequence, e.g. a numpy
+    array, an array.array or a list, without copying it. So the sequence must not be changed after recording.
+    `labels` are the row keys of the values in exported tables, by default 0, 1, 2, ...
+
+    |DictTree.to_tables()| makes a table of all arrays with the same prefix, with a column for each array.
+    """
+
+    __slots__ = ('values', 'labels')
+
+    def __init__(self, values, labels=None):
+        self.values = values
+        self.labels = labels
+
+    def tolist(self):
+        """returns the values as list, converted in bulk if the sequence supports it"""
+        values = self.values
+        return values.tolist() if hasattr(values, 'tolist') else list(values)
+
+    def row_keys(self):
+        if self.labels is None:
+            return list(range(len(self.values)))
+        return self.labels.tolist() if hasattr(self.labels, 'tolist') else list(self.labels)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, item):
+        return self.values[item]
+
+    def __str__(self):
+        values = self.tolist()
+        return '[{}{}] (n={})'.format(', '.join(map(str, values[:3])), ', ...' if len(values) > 3 else '', len(values))
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self)
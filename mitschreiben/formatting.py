@@ -10,29 +10,129 @@
 # License:  Apache License 2.0 (see LICENSE file)
 
 
-from .table import Table
+from .table import Table, ColumnTable
+from .arrays import RecordedArray
 import os
 import datetime
-
-
-class DictTree(dict):
-    """
-    A class to work with a dict whose keys are tuples as if this dict was a dictionary of dictionaries of dictionaries...
-    When trying to look up a value with key (=tuple) and this tuple is partially contained in other keys (=tuples) than
-    a DictTree with only those truncated keys is returned.
-    """
-
-    def __getitem__(self, tpl):
-        if not isinstance(tpl, tuple):
-            tpl = (tpl,)
-        if tpl in list(self.keys()):
-            return super(DictTree, self).__getitem__(tpl)
-        else:
-            kvals = [(key[len(tpl):], value) for key, value in list(self.items()) if len(key) >= len(tpl) and key[0:len(tpl)] == tpl]
-            if kvals:
-                return DictTree(kvals)
-            else:
-                raise KeyError
+import json
+import time
+from collections import deque
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+_HTML_BATCH_SIZE = 1000
+
+# resolved on import, since __file__ may be relative to the working directory (Python 2)
+_HTML_BASICS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'html_basics')
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+def _compare_keys(tpl_prev, tpl_next):
+    """returns the length of the common prefix of two keys and the remainder of the second key"""
+    j = 0
+    for x, y in zip(tpl_prev, tpl_next):
+        if x != y:
+            break
+        j += 1
+    return j, tpl_next[j:]
+
+
+class _PrefixNode(object):
+    """A node of the prefix index of a DictTree. `size` counts the keys in the subtree below (and at) the node."""
+
+    __slots__ = ('children', 'size', 'is_key')
+
+    def __init__(self):
+        self.children = dict()
+        self.size = 0
+        self.is_key = False
+
+    def find(self, tpl):
+        node = self
+        for part in tpl:
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def add(self, tpl):
+        node = self
+        node.size += 1
+        for part in tpl:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _PrefixNode()
+            child.size += 1
+            node = child
+        node.is_key = True
+
+    def remove(self, tpl):
+        node = self
+        node.size -= 1
+        for part in tpl:
+            child = node.children[part]
+            child.size -= 1
+            if not child.size:
+                del node.children[part]
+            node = child
+        node.is_key = False
+
+    def iter_keys(self):
+        stack = [((), self)]
+        while stack:
+            prefix, node = stack.pop()
+            if node.is_key:
+                yield prefix
+            for part, child in node.children.items():
+                stack.append((prefix + (part,), child))
+
+
+class _ComponentIndex(object):
+    """An index of keys by their parts: for each position and part the keys with this part at this position, and
+    for each length the keys of this length."""
+
+    __slots__ = ('keys',)
+
+    def __init__(self, keys=()):
+        self.keys = dict()
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        index = self.keys
+        for item in enumerate(key):
+            keys = index.get(item)
+            if keys is None:
+                keys = index[item] = set()
+            keys.add(key)
+        item = None, len(key)
+        keys = index.get(item)
+        if keys is None:
+            keys = index[item] = set()
+        keys.add(key)
+
+    def remove(self, key):
+        for item in list(enumerate(key)) + [(None, len(key))]:
+            keys = self.keys[item]
+            keys.discard(key)
+            if not keys:
+                del self.keys[item]
+
+    def find(self, pattern, literals):
+        """returns the keys of the length of the pattern with the given parts at the given positions"""
+        candidates = [self.keys.get(item, set()) for item in literals]
+        candidates.append(self.keys.get((None, len(pattern)), set()))
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
+
+
+class _DictTreeMethods(object):
+    """methods shared by DictTree and DictTreeView"""
 
     def toplevel_tables(self, name):
         """Return tables from the two uppermost layers of the DictTree. One of them is a true table and the
@@ -49,35 +149,150 @@ class DictTree(dict):
         for k in len2_keys:
             vt.append(k[0], k[1], self[k])
 
-        return pt.sort(), vt.sort()
+        return pt.sort(copy=False), vt.sort(copy=False)
 
     def to_tables(self):
-        """Makes a table from each level within the DictTree and returns those tables stored in a new DictTree"""
-        max_level = max(list(map(len, list(self.keys()))))
+        """Makes a table from each level within the DictTree and returns those tables stored in a new DictTree.
+
+        All tables are collected in a single pass over the entries: an entry with key `prefix + (row, column)` is a
+        cell of the table of `prefix`, entries with keys of length one make up the properties table.
+        A RecordedArray with key `prefix + (column,)` is a column of the |ColumnTable| `prefix + ('arrays',)`."""
         tables = DictTree()
-        for i in range(0, max_level):
-            for key in sorted(list(set([k[0:i] for k in list(self.keys())]))):
-                T = self[key]
-                if isinstance(T, DictTree):
-                    key_str = "---".join(map(str, key))
-                    a, b = T.toplevel_tables(key_str)
-                    if not a.is_empty() and i == 0:
-                        a.name = "Properties"
-                        tables[key+("table",)]= a.transpose()
-                    if not b.is_empty():
-                        if b.rows_count == 1:
-                            b = b.transpose()
-                        tables[key+("table",)]= b
+        properties = list()
+        groups = dict()
+        arrays = dict()
+        for key, value in self.items():
+            if not key:
+                continue
+            if isinstance(value, RecordedArray):
+                columns = arrays.get(key[:-1])
+                if columns is None:
+                    columns = arrays[key[:-1]] = list()
+                columns.append((key[-1], value))
+            elif len(key) == 1:
+                properties.append((key[0], value))
+            else:
+                cells = groups.get(key[:-2])
+                if cells is None:
+                    cells = groups[key[:-2]] = list()
+                cells.append((key[-2], key[-1], value))
+
+        # like any other prefix which is a key itself the root holds a value and its level makes no tables
+        if properties and () not in self:
+            tables[("table",)] = DictTree._properties_table(properties)
+        for key in sorted(groups, key=lambda k: (len(k), k)):
+            if key not in self:
+                tables[key + ("table",)] = DictTree._cells_table(key, groups[key])
+        for key in sorted(arrays, key=lambda k: (len(k), k)):
+            tables[key + ("arrays",)] = DictTree._arrays_table(key, arrays[key])
         return tables
 
-    def pretty_print(self):
-        "this function prints an alphabetically sorted tree in a directory-like structure."
+    @staticmethod
+    def _properties_table(properties):
+        table = Table(name="")
+        for col_key, value in properties:
+            table.append('', col_key, value)
+        table = table.sort(copy=False)
+        table.name = "Properties"
+        return table.transpose(copy=False)
 
-        def compare_keys(tpl_prev, tpl_next):
+    @staticmethod
+    def _cells_table(prefix, cells):
+        table = Table.from_cells(cells, name="---".join(map(str, prefix))).sort(copy=False)
+        return table.transpose(copy=False) if table.rows_count == 1 else table
 
-            equal_list = [x==y for x,y in zip(tpl_prev, tpl_next)]
-            j = equal_list.index(False)
-            return j, tpl_next[j:]
+    @staticmethod
+    def _arrays_table(prefix, columns):
+        table = ColumnTable(name="---".join(map(str, prefix + ("arrays",))))
+        for col_key, value in sorted(columns, key=lambda column: column[0]):
+            table.append_column(col_key, value.values, value.row_keys())
+        return table
+
+    def _table_index(self):
+        """returns a prefix index of the keys of the tables of |DictTree.to_tables()| without making the tables"""
+        index = _PrefixNode()
+        properties, groups, arrays = False, set(), set()
+        for key, value in self.items():
+            if not key:
+                continue
+            if isinstance(value, RecordedArray):
+                arrays.add(key[:-1])
+            elif len(key) == 1:
+                properties = True
+            else:
+                groups.add(key[:-2])
+        if properties and () not in self:
+            groups.add(())
+        for key in groups:
+            if key not in self:
+                index.add(key + ("table",))
+        for key in arrays:
+            index.add(key + ("arrays",))
+        return index
+
+    def _make_table(self, table_key):
+        """makes the table of |DictTree.to_tables()| with the given key from the entries below its prefix"""
+        prefix = table_key[:-1]
+        node = self._prefix_node().find(prefix)
+        if table_key[-1] == "arrays":
+            columns = [(part, self[prefix + (part,)]) for part, child in node.children.items() if child.is_key]
+            return DictTree._arrays_table(prefix, [column for column in columns
+                                                   if isinstance(column[1], RecordedArray)])
+        cells = list()
+        for row_key, row in node.children.items():
+            for col_key, child in row.children.items():
+                if child.is_key:
+                    value = self[prefix + (row_key, col_key)]
+                    if not isinstance(value, RecordedArray):
+                        cells.append((row_key, col_key, value))
+        if cells or prefix:
+            return DictTree._cells_table(prefix, cells)
+        properties = [(part, self[(part,)]) for part, child in node.children.items() if child.is_key]
+        return DictTree._properties_table([item for item in properties if not isinstance(item[1], RecordedArray)])
+
+    def query(self, pattern, predicate=None, wildcard='*'):
+        """Returns a DictTree of the entries whose keys match the pattern and whose values satisfy the predicate.
+
+        The pattern is a key in which the `wildcard` stands for any part, e.g. `('*', 'price', '*')`. Keys of the
+        same length as the pattern match. Patterns with wildcards only at the end are looked up in the prefix index,
+        any other pattern in an index of the key parts by position which is built on first use and kept up to date."""
+        pattern = pattern if isinstance(pattern, tuple) else (pattern,)
+        literals = [(i, part) for i, part in enumerate(pattern) if part != wildcard]
+        if all(i < len(literals) for i, _ in literals):
+            node = self._prefix_node().find(pattern[:len(literals)])
+            level = [(pattern[:len(literals)], node)] if node is not None else []
+            for _ in range(len(pattern) - len(literals)):
+                level = [(key + (part,), child) for key, parent in level for part, child in parent.children.items()]
+            keys = [key for key, node in level if node.is_key]
+        else:
+            keys = self._component_index().find(pattern, literals)
+        entries = self._mapping()
+        ret = DictTree()
+        for key in keys:
+            value = entries[key]
+            if predicate is None or predicate(value):
+                ret[key] = value
+        return ret
+
+    def query_table(self, pattern, predicate=None, rows=None, columns=None, name=None, wildcard='*'):
+        """Returns the entries found by |DictTree.query()| as a Table. The row and column keys are the parts of the
+        keys at the positions `rows` and `columns`, by default the positions of the first and the last wildcard."""
+        pattern = pattern if isinstance(pattern, tuple) else (pattern,)
+        wildcards = [i for i, part in enumerate(pattern) if part == wildcard]
+        if rows is None:
+            rows = wildcards[0] if wildcards else 0
+        if columns is None:
+            if len(wildcards) > 1:
+                columns = wildcards[-1]
+            elif rows != len(pattern) - 1:
+                columns = len(pattern) - 1
+        table = Table(name=name)
+        for key, value in sorted(self.query(pattern, predicate, wildcard).items()):
+            table.append(key[rows], '' if columns is None else key[columns], value)
+        return table
+
+    def pretty_print(self):
+        "this function prints an alphabetically sorted tree in a directory-like structure."
 
         keys = sorted(self.keys())
         previous_key = None
@@ -87,7 +302,7 @@ class DictTree(dict):
         for key in keys:
             rest_key = key
             if previous_key:
-                indent, rest_key = compare_keys(previous_key, key)
+                indent, rest_key = _compare_keys(previous_key, key)
 
             for i, value in enumerate(rest_key):
                 print(("|"+" "*indentfactor)*(indent+i)+value \
@@ -106,152 +321,458 @@ class DictTree(dict):
 
         return target_file_path
 
-    def as_tree_to_html(self, filename, path=None):
-        """This function creates a html file that presents the dicttree in its tree structure."""
+    @staticmethod
+    def _write_html(template, filename, path, chunks, title=None, placeholders=None):
+        """streams the chunks into the html template. `filename` is either a file name or a file-like object with a
+        `write` method; the chunks are joined and written in batches, so no intermediate file or string is built."""
+        with open(os.path.join(_HTML_BASICS, template)) as f:
+            s1, s2 = f.read().split("#SPLIT#")
+        for placeholder, text in (placeholders or dict()).items():
+            s1, s2 = s1.replace(placeholder, text), s2.replace(placeholder, text)
+
+        if hasattr(filename, 'write'):
+            if title is None:
+                title = str(getattr(filename, 'name', ''))
+            target_file, close = filename, False
+        else:
+            if title is None:
+                title = filename
+            target_file, close = open(DictTree._make_target_filename(filename, path), 'w'), True
+
+        try:
+            target_file.write(s1.replace('#TITLE', title))
+            batch = list()
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= _HTML_BATCH_SIZE:
+                    target_file.write("".join(batch))
+                    del batch[:]
+            target_file.write("".join(batch))
+            target_file.write(s2)
+        finally:
+            if close:
+                target_file.close()
 
-        target_file_path = DictTree._make_target_filename(filename, path)
+    @staticmethod
+    def _iter_accordion(keys, panel_elem):
+        """yields the nested accordion panels of sorted keys, `panel_elem(key)` gives the content of a leaf"""
+        previous_key = None
+        for key in keys:
+            rest_key = key
+            if previous_key:
+                indent, rest_key = _compare_keys(previous_key, key)
+                previous_indent = len(previous_key)-1
+                if indent < previous_indent:
+                    yield "\n</div>" * (previous_indent - indent)
+            for value in rest_key[:-1]:
+                yield "\n<button class='accordion'>{}</button>\n<div class='panel'>".format(value)
+            yield "\n<div class='panel-elem'>" + panel_elem(key) + "</div>"
+            previous_key = key
 
-        def make_button(caption):
-            return "<button class='accordion'>{}</button>".format(caption)
+    def as_tree_to_html(self, filename, path=None, title=None):
+        """This function creates a html file that presents the dicttree in its tree structure.
+        `filename` may as well be a writable file-like object."""
 
-        def compare_keys(tpl_prev, tpl_next):
-            equal_list = [x==y for x,y in zip(tpl_prev, tpl_next)]
-            j = equal_list.index(False)
-            return j, tpl_next[j:]
+        def panel_elem(key):
+            return str(key[-1]) + " : " + str(self[key])
 
-        keys = sorted(self.keys())
-        previous_key = None
+        chunks = self._iter_accordion(sorted(self.keys()), panel_elem)
+        DictTree._write_html('accordion.html', filename, path, chunks, title)
 
-        with open("htmldicttree.temp", "w") as tempfile:
-
-            for key in keys:
-                rest_key = key
-                if previous_key:
-                    indent, rest_key = compare_keys(previous_key, key)
-                    previous_indent = len(previous_key)-1
-                    if indent < previous_indent:
-                        tempfile.write("\n</div>" * abs(previous_indent - indent))
-                for i, value in enumerate(rest_key):
-                    if i == len(rest_key)-1:
-                        tempfile.write("\n<div class='panel-elem'>" + value +" : " + str(self[key]) + "</div>")
-                    else:
-                        tempfile.write("\n"+make_button(value))
-                        tempfile.write("\n<div class='panel'>")
-                previous_key = key
-
-        abs_path = os.path.join(os.path.split(__file__)[0], 'html_basics', 'accordion.html')
-        f = open(abs_path)
-        s1, s2 = f.read().split("#SPLIT#")
-        s1 = s1.replace('#TITLE', filename)
-        f.close()
-        with open('htmldicttree.temp') as temp:
-            with open(target_file_path, 'w') as target_file:
-                target_file.write(s1)
-                for line in temp.readlines():
-                    target_file.write(line)
-                target_file.write(s2)
-
-        os.remove('htmldicttree.temp')
-
-    def as_tables_to_html(self, filename, path=None):
-        """This functions creates a html file presenting the tree in tables"""
-
-        target_file_path = DictTree._make_target_filename(filename, path)
-
-        tbs = self.to_tables()
-        abs_path = os.path.join(os.path.split(__file__)[0],'html_basics','tables.html')
-
-        f = open(abs_path)
-        s1, s2 = f.read().split("#SPLIT#")
-        s1 = s1.replace('#TITLE', filename)
-        f.close()
-
-        with open(target_file_path, "w") as f:
-
-            f.write(s1)
-
-            for tb in sorted(list(tbs.values()), key=lambda x: x.name):
-                f.write("<table>\n")
+    def as_tables_to_html(self, filename, path=None, title=None):
+        """This functions creates a html file presenting the tree in tables.
+        `filename` may as well be a writable file-like object."""
+
+        def chunks():
+            for tb in sorted(list(self.to_tables().values()), key=lambda x: x.name):
                 if tb.name == "":
                     tb.name = "TOP"
-                f.write("<tr><td>{}</td></tr>\n".format(tb.to_html()))
-                f.write("</table>\n")
-            f.write(s2)
+                yield "<table>\n<tr><td>"
+                for chunk in tb.iter_html():
+                    yield chunk
+                yield "</td></tr>\n</table>\n"
+
+        DictTree._write_html('tables.html', filename, path, chunks(), title)
 
-    def as_html_tree_table(self, filename, path=None):
+    def as_html_tree_table(self, filename, path=None, title=None):
         """This function creates a html file, that is structured like a tree, where the last two-level-deep branches
-        are represented as tables"""
+        are represented as tables. `filename` may as well be a writable file-like object."""
 
         tree = self.to_tables()
 
-        target_file_path = DictTree._make_target_filename(filename, path)
+        def panel_elem(key):
+            tb = tree[key]
+            tb.name = str(key[-1])
+            return tb.to_html()
 
-        def make_button(caption):
-            return "<button class='accordion'>{}</button>".format(caption)
+        chunks = self._iter_accordion(sorted(list(tree.keys()), key=lambda x: x[:-1]), panel_elem)
+        DictTree._write_html('accordion_tables_combined.html', filename, path, chunks, title)
 
-        def compare_keys(tpl_prev, tpl_next):
+    @staticmethod
+    def _iter_lazy_chunks(node, panel_elem, page_size):
+        """yields pairs of chunk id and html of the nodes of a prefix index, breadth first. A chunk holds the direct
+        children of a node, at most `page_size` of them; the panels of inner children and the rest of the children
+        refer to later chunks by id. The chunk of the root node has id 0."""
+        queue = deque([((), node, 0)])
+        next_id = 1
+        while queue:
+            prefix, node, chunk_id = queue.popleft()
+            parts = sorted(node.children)
+            for start in range(0, max(len(parts), 1), page_size):
+                html = list()
+                for part in parts[start:start + page_size]:
+                    child, key = node.children[part], prefix + (part,)
+                    if child.is_key:
+                        html.append("\n<div class='panel-elem'>" + panel_elem(key) + "</div>")
+                    if child.children:
+                        html.append("\n<button class='accordion'>{}</button>\n<div class='panel' data-chunk='{}'></div>"
+                                    .format(part, next_id))
+                        queue.append((key, child, next_id))
+                        next_id += 1
+                more_id = next_id
+                if start + page_size < len(parts):
+                    html.append("\n<button class='more' data-chunk='{}'>... {} more</button>"
+                                .format(more_id, len(parts) - start - page_size))
+                    next_id += 1
+                yield chunk_id, "".join(html)
+                chunk_id = more_id
+
+    def as_lazy_html_report(self, filename, path=None, title=None, tables=True, page_size=100, embed=False):
+        """This function creates a html report for large trees which only renders what is expanded in the browser.
+
+        The page holds the top level of the tree, every subtree and every further page of more than `page_size`
+        siblings is a chunk which is loaded when its panel is opened. The chunks are written as script files into the
+        directory `<filename>_chunks` next to the page (which works for local files, too) or, if `embed` is true or
+        `filename` is a file-like object, embedded as json into the page. With `tables` the leaves are the tables of
+        |DictTree.to_tables()|, otherwise the values of the tree. Each table is made only when the chunk holding it
+        is written."""
+
+        if tables:
+            index = self._table_index()
+
+            def panel_elem(key):
+                tb = self._make_table(key)
+                tb.name = str(key[-1])
+                return tb.to_html()
+        else:
+            index = self._prefix_node()
 
-            equal_list = [x==y for x,y in zip(tpl_prev, tpl_next)]
-            j = equal_list.index(False)
-            return j, tpl_next[j:]
+            def panel_elem(key):
+                return str(key[-1]) + " : " + str(self[key])
 
-        keys = sorted(list(tree.keys()), key=lambda x: x[:-1])
-        previous_key = None
+        chunk_dir = None
+        if not embed and not hasattr(filename, 'write'):
+            chunk_dir = os.path.splitext(DictTree._make_target_filename(filename, path))[0] + '_chunks'
+            if not os.path.isdir(chunk_dir):
+                os.makedirs(chunk_dir)
+
+        def chunks():
+            for chunk_id, html in DictTree._iter_lazy_chunks(index, panel_elem, page_size):
+                if not chunk_id:
+                    yield html
+                elif chunk_dir:
+                    with open(os.path.join(chunk_dir, '{}.js'.format(chunk_id)), 'w') as f:
+                        f.write("mitschreiben_chunk({}, {});\n".format(chunk_id, json.dumps(html)))
+                else:
+                    yield "\n<script type='application/json' id='chunk-{}'>{}</script>".format(
+                        chunk_id, json.dumps(html).replace('</', '<\\/'))
+
+        placeholders = {'#CHUNKS': os.path.basename(chunk_dir) if chunk_dir else ''}
+        DictTree._write_html('lazy_report.html', filename, path, chunks(), title, placeholders)
+
+    def to_archive(self, filename, path=None):
+        """writes the tree to a binary file which can be read by |mitschreiben.archive.RecordArchive|"""
+        from .archive import RecordArchive
+        RecordArchive.write(self, DictTree._make_target_filename(filename, path))
+
+    def to_csv_files(self, path, workers=None, processes=False, progress=None):
+        """this function creates csv files for every table that can be made from the tree.
 
-        with open("htmldicttree.temp", "w") as tempfile:
-
-            for key in keys:
-                rest_key = key
-                if previous_key:
-                    indent, rest_key = compare_keys(previous_key, key)
-                    previous_indent = len(previous_key)-1
-                    if indent < previous_indent:
-                        tempfile.write("\n</div>" * abs(previous_indent - indent))
-                for i, value in enumerate(rest_key):
-                    if i == len(rest_key)-1 :
-                        tb = tree[key]
-                        tb.name = str(key[-1])
-                        tempfile.write("\n<div class='panel-elem'>" + tb.to_html()  + "</div>")
-                    else:
-                        tempfile.write("\n"+make_button(value))
-                        tempfile.write("\n<div class='panel'>")
-                previous_key = key
-
-        abs_path = os.path.join(os.path.split(__file__)[0], 'html_basics', 'accordion_tables_combined.html')
-        f = open(abs_path)
-        s1, s2 = f.read().split("#SPLIT#")
-        s1 = s1.replace("#TITLE", filename)
-        f.close()
-
-        with open('htmldicttree.temp') as temp:
-            with open(target_file_path, 'w') as target_file:
-                target_file.write(s1)
-                for line in temp.readlines():
-                    target_file.write(line)
-                target_file.write(s2)
-
-        os.remove('htmldicttree.temp')
-
-    def to_csv_files(self, path):
-        "this function creates csv files for every table that can be made from the tree"
+        With `workers` greater than one the tables are formatted and written concurrently by a pool of as many threads
+        or, if `processes` is true, processes. `progress` is called as `progress(done, total, filename)` after each
+        file. Returns a Table with the number of rows and columns and the seconds taken for each file."""
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d")
 
         def make_filename(tabname):
-            timestamp = datetime.datetime.now().strftime("%Y%m%d")
             if len(tabname) > 200:
-                tabname = tabname[:100]+"___"+reversed(reversed(tabname)[:100])
-
-            tabname = timestamp + "_" + tabname + ".csv"
-            return tabname
+                tabname = tabname[:100] + "___" + tabname[-100:]
+            filename = timestamp + "_" + tabname + ".csv"
+            return os.path.join(path, filename) if path else filename
 
         if path and not os.path.isdir(path):
             os.makedirs(path)
 
-        for tb in list(self.to_tables().values()):
-            filename = make_filename(tb.name)
-            if path:
-                target_file_path = os.path.join(path, filename)
-            else:
-                target_file_path = filename
+        tasks = [(make_filename(tb.name), tb) for tb in self.to_tables().values()]
+        report = Table(name="csv files")
+
+        def collect(results):
+            for done, (filename, rows, cols, seconds) in enumerate(results, 1):
+                report.append(filename, 'rows', rows)
+                report.append(filename, 'columns', cols)
+                report.append(filename, 'seconds', seconds)
+                if progress is not None:
+                    progress(done, len(tasks), filename)
+
+        if workers is None or workers < 2:
+            collect(_write_csv_file(filename, tb) for filename, tb in tasks)
+            return report.sort()
+        try:
+            from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+        except ImportError:  # Python 2 without the futures backport
+            from multiprocessing.pool import Pool, ThreadPool
+            pool = (Pool if processes else ThreadPool)(workers)
+            try:
+                collect(pool.imap_unordered(_write_csv_task, tasks))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+            with executor(max_workers=workers) as pool:
+                futures = [pool.submit(_write_csv_file, filename, tb) for filename, tb in tasks]
+                collect(future.result() for future in as_completed(futures))
+        return report.sort()
+
+
+def _write_csv_file(filename, table):
+    """writes a table to a csv file and returns the file name, the size of the table and the seconds taken"""
+    start = _clock()
+    with open(filename, "w") as f:
+        table.write_csv(f)
+    return filename, table.rows_count, table.cols_count, _clock() - start
+
+
+def _write_csv_task(task):
+    return _write_csv_file(*task)
+
+
+class DictTree(_DictTreeMethods, dict):
+    """
+    A class to work with a dict whose keys are tuples as if this dict was a dictionary of dictionaries of dictionaries...
+    When trying to look up a value with key (=tuple) and this tuple is partially contained in other keys (=tuples) than
+    a DictTreeView with only those truncated keys is returned.
+
+    The keys are kept in a prefix index, so exact and partial lookups only take time proportional to the key length.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(DictTree, self).__init__(*args, **kwargs)
+        self._components = None
+        self._index = _PrefixNode()
+        for key in dict.keys(self):
+            if isinstance(key, tuple):
+                self._index.add(key)
+
+    def _prefix_node(self):
+        return self._index
+
+    def _component_index(self):
+        if self._components is None:
+            self._components = _ComponentIndex(key for key in dict.keys(self) if isinstance(key, tuple))
+        return self._components
+
+    def _mapping(self):
+        return self
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    def __getitem__(self, tpl):
+        if not isinstance(tpl, tuple):
+            tpl = (tpl,)
+        if dict.__contains__(self, tpl):
+            return dict.__getitem__(self, tpl)
+        node = self._index.find(tpl)
+        if node is None or not node.size:
+            raise KeyError(tpl)
+        return DictTreeView(self, tpl)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, tuple) and not dict.__contains__(self, key):
+            self._index.add(key)
+            if self._components is not None:
+                self._components.add(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        if isinstance(key, tuple):
+            self._remove_key(key)
+
+    def _remove_key(self, key):
+        self._index.remove(key)
+        if self._components is not None:
+            self._components.remove(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key, *default):
+        if dict.__contains__(self, key):
+            value = dict.__getitem__(self, key)
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if isinstance(key, tuple):
+            self._remove_key(key)
+        return key, value
+
+    def clear(self):
+        dict.clear(self)
+        self._index = _PrefixNode()
+        self._components = None
+
+    def copy(self):
+        return self.__class__(self)
+
+
+class DictTreeView(_DictTreeMethods, Mapping):
+    """
+    A read-only view on the part of a DictTree whose keys start with a given prefix. The prefix is cut off from the
+    keys of the view. The view shares the storage of its DictTree and so reflects later changes of the DictTree.
+    The node of the prefix is looked up in the index of the DictTree on each access, since it may be replaced.
+    """
+
+    def __init__(self, tree, prefix):
+        self._tree = tree
+        self._prefix = prefix
+
+    def __getitem__(self, tpl):
+        if not isinstance(tpl, tuple):
+            tpl = (tpl,)
+        return self._tree[self._prefix + tpl]
+
+    def __contains__(self, key):
+        return isinstance(key, tuple) and (self._prefix + key) in self._tree
+
+    def _prefix_node(self):
+        node = self._tree._prefix_node().find(self._prefix)
+        return _PrefixNode() if node is None else node
+
+    def __iter__(self):
+        return self._prefix_node().iter_keys()
+
+    def __len__(self):
+        return self._prefix_node().size
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__, self._prefix, dict(self.items()))
+
+    def query(self, pattern, predicate=None, wildcard='*'):
+        """returns a DictTree of the entries of the view as found by |DictTree.query()|"""
+        pattern = pattern if isinstance(pattern, tuple) else (pattern,)
+        n = len(self._prefix)
+        found = self._tree.query(self._prefix + pattern, predicate, wildcard)
+        return DictTree((key[n:], value) for key, value in found.items())
+
+    def copy(self):
+        """returns a DictTree holding a copy of the entries of the view"""
+        return DictTree(self.items())
+
+
+class RecordTree(_DictTreeMethods, Mapping):
+    """
+    A read-only DictTree on the live entries of a Record, see |Record().tree|. The entries are not copied but read
+    from the record, which logs the keys it adds once it has a tree. Only these keys are added to the prefix index
+    (and the index of key parts used by |DictTree.query()|) on the next access. The indices are rebuilt when the
+    record was cleared or its storage replaced, or when the number of entries shows that |Record().entries| were
+    changed directly. Keys, values and items are snapshots, so other threads may go on recording while they are used.
+    """
+
+    def __init__(self, record):
+        self._record = record
+        self._entries = None
+        self._generation = None
+        self._index = _PrefixNode()
+        self._components = None
+
+    def _add_keys(self, keys):
+        index, components = self._index, self._components
+        for key in keys:
+            if isinstance(key, tuple):
+                node = index.find(key)
+                if node is None or not node.is_key:
+                    index.add(key)
+                    if components is not None:
+                        components.add(key)
+
+    def _mapping(self):
+        """returns the entries of the record after adding the keys logged since the last call to the indices"""
+        record = self._record
+        with record._lock:
+            entries = record.entries
+            log = record._key_log
+            if entries is self._entries and record._generation == self._generation:
+                self._add_keys(log)
+                del log[:]
+                if self._index.size == len(entries):
+                    return entries
+            del log[:]
+            self._entries, self._generation = entries, record._generation
+            self._index, self._components = _PrefixNode(), None
+            self._add_keys(entries)
+        return entries
+
+    def _prefix_node(self):
+        self._mapping()
+        return self._index
+
+    def _component_index(self):
+        with self._record._lock:
+            entries = self._mapping()
+            if self._components is None:
+                self._components = _ComponentIndex(key for key in entries if isinstance(key, tuple))
+        return self._components
+
+    def __getitem__(self, tpl):
+        if not isinstance(tpl, tuple):
+            tpl = (tpl,)
+        entries = self._mapping()
+        if tpl in entries:
+            return entries[tpl]
+        node = self._index.find(tpl)
+        if node is None or not node.size:
+            raise KeyError(tpl)
+        return DictTreeView(self, tpl)
+
+    def __contains__(self, key):
+        return key in self._mapping()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._mapping())
+
+    def keys(self):
+        with self._record._lock:
+            return list(self._mapping())
+
+    def items(self):
+        with self._record._lock:
+            return list(self._mapping().items())
+
+    def values(self):
+        with self._record._lock:
+            return list(self._mapping().values())
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self._record)
 
-            with open(target_file_path, "w") as f:
-                f.write(tb.to_csv())
+    def copy(self):
+        """returns a DictTree holding a copy of the entries"""
+        return DictTree(self.items())
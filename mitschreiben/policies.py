@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+#
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+
+from collections import deque
+import random
+import time
+
+__all__ = ['SKIP', 'EveryNth', 'FirstK', 'LastK', 'Reservoir', 'RateLimit']
+
+SKIP = object()
+
+
+class EveryNth(object):
+    """records the 1st, (n+1)th, (2n+1)th, ... value of each key"""
+
+    def __init__(self, n):
+        self.n = n
+        self._counts = dict()
+
+    def __call__(self, key, value):
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return value if count % self.n == 0 else SKIP
+
+
+class _Snapshots(object):
+    """
+    A base of the policies which keep a list of values of each key. A snapshot of the list is recorded on the 1st,
+    (n+1)th, (2n+1)th, ... change of the list of a key, with n = `every`. Each snapshot is a new list of up to k values
+    which is also written to every sink, so a policy costs O(k / every) time and output per change on average. The
+    snapshots of the last changes are recorded by |Record().set_policy()|, when the policy is replaced, or when the
+    scope whose record set the policy is left.
+    """
+
+    def __init__(self, k, every=1):
+        self.k = k
+        self.every = every
+        self._changes = dict()
+        self._pending = dict()
+
+    def _snapshot(self, key, values):
+        """returns a snapshot of the changed values of a key or SKIP"""
+        changes = self._changes.get(key, 0)
+        self._changes[key] = changes + 1
+        if changes % self.every == 0:
+            self._pending.pop(key, None)
+            return list(values)
+        self._pending[key] = values
+        return SKIP
+
+    def flush(self):
+        """returns the keys and snapshots of the values which changed since their last snapshot"""
+        pending, self._pending = self._pending, dict()
+        return [(key, list(values)) for key, values in pending.items()]
+
+
+class FirstK(_Snapshots):
+    """records a list of the first k values of each key"""
+
+    def __init__(self, k, every=1):
+        super(FirstK, self).__init__(k, every)
+        self._values = dict()
+
+    def __call__(self, key, value):
+        values = self._values.get(key)
+        if values is None:
+            values = self._values[key] = list()
+        if len(values) == self.k:
+            return SKIP
+        values.append(value)
+        return self._snapshot(key, values)
+
+
+class LastK(_Snapshots):
+    """records a list of the last k values of each key"""
+
+    def __init__(self, k, every=1):
+        super(LastK, self).__init__(k, every)
+        self._values = dict()
+
+    def __call__(self, key, value):
+        values = self._values.get(key)
+        if values is None:
+            values = self._values[key] = deque(maxlen=self.k)
+        values.append(value)
+        return self._snapshot(key, values)
+
+
+class Reservoir(_Snapshots):
+    """records a list of k values of each key sampled uniformly from all its values (reservoir sampling)"""
+
+    def __init__(self, k, seed=None, every=1):
+        super(Reservoir, self).__init__(k, every)
+        self._random = random.Random(seed)
+        self._samples = dict()
+
+    def __call__(self, key, value):
+        count, sample = self._samples.get(key, (0, None))
+        if sample is None:
+            sample = list()
+        count += 1
+        self._samples[key] = count, sample
+        if count <= self.k:
+            sample.append(value)
+            return self._snapshot(key, sample)
+        i = self._random.randrange(count)
+        if i < self.k:
+            sample[i] = value
+            return self._snapshot(key, sample)
+        return SKIP
+
+
+class RateLimit(object):
+    """records a value of a key only if the last recorded value of this key is at least `interval` seconds old"""
+
+    def __init__(self, interval, clock=time.time):
+        self.interval = interval
+        self.clock = clock
+        self._times = dict()
+
+    def __call__(self, key, value):
+        now = self.clock()
+        last = self._times.get(key)
+        if last is not None and now - last < self.interval:
+            return SKIP
+        self._times[key] = now
+        return value
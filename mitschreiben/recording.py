@@ -12,11 +12,50 @@
 
 from inspect import getargspec
 from functools import wraps
+import threading
+import time
+import zlib
 from six import with_metaclass
+from six.moves import builtins, cPickle as pickle
 
-from .formatting import DictTree
+try:
+    from contextvars import ContextVar
+except ImportError:  # Python < 3.7
+    ContextVar = None
 
-__all__ = ['Record']
+from .formatting import DictTree, RecordTree
+from .table import Table
+from .arrays import RecordedArray
+from .archive import RecordArchive
+from .policies import SKIP
+
+__all__ = ['Record', 'RecordedCall']
+
+try:
+    from time import perf_counter as _wall_clock
+except ImportError:  # Python 2
+    from time import time as _wall_clock
+
+# cpu time of the current thread if available (Python 3.7+)
+_cpu_clock = getattr(time, 'thread_time', None) or getattr(time, 'process_time', None) or time.clock
+
+
+class _ThreadLocalVar(threading.local):
+    """A stand-in for contextvars.ContextVar which keeps a value per thread, used if contextvars is not available."""
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.value = default
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+# the scope of the current thread or task: a tuple of (record, prefix stack tuple) pairs, innermost last
+_scope = (ContextVar or _ThreadLocalVar)('mitschreiben_record_scope', default=())
 
 
 class RecordMeta(type):
@@ -28,6 +67,16 @@ class RecordMeta(type):
             record._record(*args, **kwargs)
         return record
 
+    @property
+    def _records(cls):
+        """the records of the current thread or task, outermost first"""
+        return [record for record, prefix in cls._frames()]
+
+    @property
+    def _record_level(cls):
+        """the level of the current record in the current thread or task"""
+        return len(cls._frames()) - 1
+
 
 class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
     """
@@ -73,6 +122,16 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
     does not know what might have been recorded in an outer scope. When leaving the inner scope the Record-Object will
     be integrated in the Record-Object of the outer scope.
 
+    Scopes and prefix stacks belong to the current thread or asyncio task (using contextvars, or a thread-local
+    fallback if contextvars is not available). A new thread starts in the toplevel scope, which is shared by all threads.
+    An asyncio task or a thread started with |contextvars.copy_context().run| starts in the scope it was created in,
+    but with its own copy of the prefix stack, so it records into the same Record-Object as its creator.
+    When leaving a scope the inner Record-Object is merged into the Record-Object which is current in the same thread
+    or task, with the prefix stack of that thread or task. Merges are serialized. If concurrent scopes record the
+    same key, the last merge wins.
+    On Python 3.5 and 3.6 there are no contextvars and the fallback keeps scopes per thread only, so the asyncio
+    tasks of a thread share their scopes and prefix stacks there.
+
     With |Record().entries| one access the dict containing the recorded keys and values.
 
     Record makes use of two subclasses: Key and Prefix
@@ -106,8 +165,9 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
         {"bar.foo|key":value}
 
     """
-    _records = list()
-    _record_level = 0
+    _root = None
+    _started_count = 0
+    _lock = threading.RLock()
 
     class Key(tuple):
         """
@@ -144,11 +204,29 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
         """
         This decorator generates a key extension depending on the method it decorates and the object that is passed
         to that method. This class remembers which methods have been decorated.
+
+        With |Record.Prefix.fast_path(True)| decorated functions are called directly, i.e. without building a prefix
+        and without remembering the method, as long as no Record is started. Note that in this mode a Record started
+        inside a decorated function does not know the prefixes of the calls which are already running.
+
+        With |Record.Prefix.profiling(True)| the decorator measures each call, whether or not a Record is started.
+        For each decorated method and for each prefix path (the prefix stack of the current Record after adding the
+        prefix of the call) it sums up the number of calls and the wall and cpu time, including and excluding (self)
+        the time spent in calls of other decorated functions. |Record.Prefix.profile_table()| and
+        |Record.Prefix.profile_tree()| report them. Recursive calls are counted at every level.
         """
 
         _logged_methods = dict()
         _auto_log_return_value = False
         _Record_Reference = None
+        _fast_path = False
+        _bypass = False
+        _profiling = False
+        _method_profile = dict()
+        _path_profile = dict()
+        _profile_stack = threading.local()
+        _profile_columns = ('calls', 'wall', 'cpu', 'self wall', 'self cpu')
+        _builtin_types = frozenset(t for t in vars(builtins).values() if isinstance(t, type))
 
         @classmethod
         def logged_methods(cls):
@@ -158,6 +236,66 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
         def autologging(cls, boolean):
             cls._auto_log_return_value = boolean
 
+        @classmethod
+        def fast_path(cls, boolean):
+            """switches the fast path mode on or off"""
+            cls._fast_path = boolean
+            cls._update_bypass()
+
+        @classmethod
+        def profiling(cls, boolean):
+            """switches the profiling mode on or off"""
+            cls._profiling = boolean
+            cls._update_bypass()
+
+        @classmethod
+        def reset_profile(cls):
+            cls._method_profile.clear()
+            cls._path_profile.clear()
+
+        @classmethod
+        def profile_table(cls):
+            """returns a Table with a row for each decorated method (module.class.method) ordered by the total time"""
+            table = Table(name='Profile', left_upper='method')
+            for method, stats in sorted(cls._method_profile.items(), key=lambda item: -item[1][1]):
+                table.append_row(method, dict(zip(cls._profile_columns, stats)))
+            return table
+
+        @classmethod
+        def profile_tree(cls):
+            """returns a DictTree with keys prefix path + (column,), e.g. ('Foo(bar).price', 'calls')"""
+            tree = DictTree()
+            for path, stats in cls._path_profile.items():
+                for column, value in zip(cls._profile_columns, stats):
+                    tree[path + (column,)] = value
+            return tree
+
+        @classmethod
+        def _update_bypass(cls):
+            cls._bypass = cls._fast_path and not cls._profiling and not Record._started_count
+
+        @classmethod
+        def _profile_call(cls, path, method, function, args, kwargs):
+            stack = getattr(cls._profile_stack, 'stack', None)
+            if stack is None:
+                stack = cls._profile_stack.stack = list()
+            children = [0., 0.]
+            stack.append(children)
+            wall, cpu = _wall_clock(), _cpu_clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                wall, cpu = _wall_clock() - wall, _cpu_clock() - cpu
+                stack.pop()
+                if stack:
+                    stack[-1][0] += wall
+                    stack[-1][1] += cpu
+                call = (1, wall, cpu, wall - children[0], cpu - children[1])
+                with Record._lock:
+                    for profile, key in ((cls._method_profile, method), (cls._path_profile, path)):
+                        stats = profile.get(key)
+                        profile[key] = call if stats is None else tuple(map(sum, zip(stats, call)))
+
         def __init__(self, prefix=None):
             self.prefix = prefix
 
@@ -169,30 +307,38 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
             if not self.prefix:
                 self.prefix = function.__name__
 
-            origin = function.__module__
-
-            BUILTINTYPES = [t for t in list(__builtins__.values()) if isinstance(t, type)]
+            module_origin = function.__module__
+            prefix_cls = Record.Prefix
+            builtin_types = prefix_cls._builtin_types
 
             @wraps(function)
             def helper(*args, **kwargs):
+                if prefix_cls._bypass:
+                    return function(*args, **kwargs)
+                origin = module_origin
                 if args:
                     first = args[0]
-                    if first in BUILTINTYPES or type(first) in BUILTINTYPES:
+                    if type(first) in builtin_types or (isinstance(first, type) and first in builtin_types):
                         pass
                     else:
                         first_class = first if isinstance(first, type) else first.__class__
                         # origin = str(first_class)  # 2to3 migration 20190915
                         origin = first_class.__module__ + '.' + first_class.__name__
 
-                Record.Prefix._log_method(origin, function)
+                prefix_cls._log_method(origin, function)
                 if args:
                     caller = repr(args[0])
                 else:
                     caller = origin
                 pref = caller + '.' + self.prefix
 
-                with Record().append_prefix(pref):
-                    value = function(*args, **kwargs)
+                record = Record()
+                with record.append_prefix(pref):
+                    if prefix_cls._profiling:
+                        method = origin + '.' + function.__name__
+                        value = prefix_cls._profile_call(record._prefix_key(), method, function, args, kwargs)
+                    else:
+                        value = function(*args, **kwargs)
                 return value
 
             setattr(helper, 'getargsinspect', getargspec(function))
@@ -202,24 +348,67 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
         @classmethod
         def _log_method(cls, origin, function):
 
-            A = cls.logged_methods()
-            a = A.get(origin) if A.get(origin) else set()
-            a.add(function.__name__)
-            A[origin] = a
+            cls.logged_methods().setdefault(origin, set()).add(function.__name__)
 
     def __new__(cls, *args, **kwargs):
+        return cls._frames()[-1][0]
+
+    @classmethod
+    def _new_record(cls, level, storage=dict):
+        record = super(Record, cls).__new__(cls)
+        record._storage = storage
+        record._entries = storage()
+        record._segments = [((), record._entries)]
+        record._sealed = False
+        record._shared = False
+        record._sinks = ()
+        record._sink_specs = ()
+        record._retain = True
+        record._base = cls.Key()
+        record._policy = None
+        record._owns_policy = False
+        record._started = False
+        record._level = level
+        record._generation = 0
+        record._tree = None
+        record._key_log = None
+        return record
 
-        if cls._records and len(cls._records)-1 == cls._record_level:
-            instance = cls._records[-1]
-        else:
-            new_instance = super(Record, cls).__new__(cls)
-            new_instance._entries = dict()
-            new_instance._prefix_stack = list()
-            new_instance._started = False
-            new_instance._level = cls._record_level
-            cls._records.append(new_instance)
-            instance = new_instance
-        return instance
+    @classmethod
+    def _frames(cls):
+        frames = _scope.get()
+        if not frames:
+            if Record._root is None:
+                with Record._lock:
+                    if Record._root is None:
+                        Record._root = cls._new_record(0)
+            frames = ((Record._root, Record.Key()),)
+            _scope.set(frames)
+        return frames
+
+    def _frame_index(self):
+        frames = self.__class__._frames()
+        for i in range(len(frames) - 1, -1, -1):
+            if frames[i][0] is self:
+                return frames, i
+        msg = "{} is not in the scope of the current thread or task.".format(self)
+        raise RuntimeError(msg)
+
+    def _prefix_key(self):
+        """the prefix stack of the Record in the current thread or task as Record.Key"""
+        frames = self.__class__._frames()
+        if frames[-1][0] is self:
+            return frames[-1][1]
+        try:
+            frames, i = self._frame_index()
+        except RuntimeError:
+            return Record.Key()
+        return frames[i][1]
+
+    @property
+    def _prefix_stack(self):
+        """the prefix stack of the Record in the current thread or task"""
+        return list(self._prefix_key())
 
     @property
     def is_started(self):
@@ -229,90 +418,363 @@ class Record(with_metaclass(RecordMeta, object)):  # 2to3 migration 20190915
     @property
     def entries(self):
         """returns a dictionary with Recordkeys and Values"""
+        self._materialize()
         return self._entries
 
+    def _materialize(self):
+        """Entries of inner scopes are not copied when merged (see |Record()._extend()|) but kept as segments of
+        (prefix, mapping) pairs. Here the segments are joined into a single mapping. A record whose segments were
+        attached to an outer record copies them, so changes to its entries do not change the outer record."""
+        if len(self._segments) == 1 and not self._shared:
+            return
+        with Record._lock:
+            segments = self._segments
+            if self._shared:
+                # the mappings are also segments of an outer record and must not change
+                entries, segments = self._storage(), segments
+            else:
+                entries, segments = segments[0][1], segments[1:]
+            log = self._key_log
+            for prefix, mapping in segments:
+                if prefix:
+                    for key, value in mapping.items():
+                        entries[prefix + key] = value
+                    if log is not None:
+                        log.extend(prefix + key for key in mapping)
+                else:
+                    entries.update(mapping)
+                    if log is not None:
+                        log.extend(mapping)
+            self._entries = entries
+            self._segments = [((), entries)]
+            self._sealed = False
+            self._shared = False
+
+    @property
+    def tree(self):
+        """returns a |mitschreiben.formatting.RecordTree|, i.e. a read-only DictTree on the live entries of the
+        record which does not copy them and updates its index with the entries recorded since its last use"""
+        if self._tree is None:
+            with Record._lock:
+                # from now on the record logs the keys it adds for the tree
+                self._key_log = list()
+                self._tree = RecordTree(self)
+        return self._tree
+
     def _to_dict_tree(self):
-        """returns a DictTree made from the record.entries"""
-        return DictTree(self.entries)
+        """returns the entries as DictTree, see |Record().tree|"""
+        return self.tree
 
-    def to_csv_files(self, path):
-        """creates csv files for the different levels of the record in the given path."""
-        self._to_dict_tree().to_csv_files(path)
+    def to_csv_files(self, path, workers=None, processes=False, progress=None):
+        """creates csv files for the different levels of the record in the given path, optionally in parallel
+        (see |DictTree.to_csv_files()|), and returns a Table reporting the files written."""
+        return self._to_dict_tree().to_csv_files(path, workers, processes, progress)
 
     def to_html_tables(self, filename, path=None):
         """creates a html structured like the levels of the graph (directory like) where the last two branch levels are
         made into a table"""
         self._to_dict_tree().as_html_tree_table(filename, path)
 
+    def to_html_report(self, filename, path=None, title=None, tables=True, page_size=100, embed=False):
+        """creates a html report like |Record.to_html_tables()| for large records, which loads subtrees and tables
+        only when they are expanded (see |DictTree.as_lazy_html_report()| for the arguments)"""
+        self._to_dict_tree().as_lazy_html_report(filename, path, title, tables, page_size, embed)
+
+    def to_archive(self, filename, path=None):
+        """writes the entries to a binary file which can be read by |mitschreiben.archive.RecordArchive|"""
+        RecordArchive.write(self.entries, DictTree._make_target_filename(filename, path))
+
     def clear(self):
         """this method clears the entries of a Record instance. Since there is only one toplevel Record instance everything
         is recorded there during its lifetime."""
-        self._entries.clear()
+        if self._shared:
+            self._entries = self._storage()
+        else:
+            self._entries = self._segments[0][1]
+            self._entries.clear()
+        self._segments = [((), self._entries)]
+        self._sealed = False
+        self._shared = False
+        self._generation += 1
+
+    def set_storage(self, storage):
+        """sets the type of mapping which keeps the entries, e.g. |mitschreiben.storage.ColumnarEntries| instead of
+        dict. `storage` is called without arguments to create the mapping. The entries recorded so far are moved to
+        the new mapping. Inner scopes of the record use the same type of mapping."""
+        entries = storage()
+        entries.update(self.entries)
+        self._storage = storage
+        self._entries = entries
+        self._segments = [((), entries)]
+        self._shared = False
+        self._generation += 1
 
     def start(self):
-        self._started = True
+        with Record._lock:
+            if not self._started:
+                Record._started_count += 1
+                Record.Prefix._update_bypass()
+            self._started = True
 
     def stop(self):
         """"""
-        self._started = False
+        with Record._lock:
+            if self._started:
+                Record._started_count -= 1
+                Record.Prefix._update_bypass()
+            self._started = False
 
     def append_prefix(self, prefix):
         """extend the current prefix stack by the prefix. If used as contextmanager the prefix will be removed outside
         of the context"""
-        self._prefix_stack.append(prefix)
+        frames, i = self._frame_index()
+        prefix_key = Record.Key(tuple.__add__(frames[i][1], (prefix,)))
+        _scope.set(frames[:i] + ((self, prefix_key),) + frames[i + 1:])
         return Record._add_prefix_context()
 
     def pop_prefix(self):
         "remove the last extension from the prefix stack"
-        return self._prefix_stack.pop()
+        frames, i = self._frame_index()
+        prefix_stack = frames[i][1]
+        if not prefix_stack:
+            raise IndexError('pop from empty prefix stack')
+        _scope.set(frames[:i] + ((self, Record.Key(prefix_stack[:-1])),) + frames[i + 1:])
+        return prefix_stack[-1]
+
+    def add_sink(self, sink, retain=True):
+        """adds a sink (see |mitschreiben.sinks|) which receives every entry added to the record, i.e. recorded in this
+        scope or merged from an inner scope. With retain=False the record no longer keeps its entries in memory, unless
+        another of its sinks was added with retain=True. Inner scopes entered later write their entries directly to
+        the sinks, with the keys they get in the record, and keep them in memory only if the record does."""
+        self._set_sinks(self._sink_specs + ((sink, retain),))
+
+    def set_policy(self, policy=None):
+        """sets a policy which decides which values are recorded, e.g. |mitschreiben.policies.EveryNth(100)| to
+        record only every 100th value of each key. A policy is called with the key and the value of each entry added
+        to the record (recorded in this scope or merged from an inner scope) and returns the value to record or
+        |mitschreiben.policies.SKIP|. `policy=None` records all values again. Inner scopes entered later apply the
+        policy themselves, with the keys their entries get in the record, so they do not keep more values either.
+        Policies like |mitschreiben.policies.LastK(k, every)| record the snapshots they held back when they are
+        replaced or when the scope of the record is left."""
+        self._flush_policy()
+        self._policy = policy
+        self._owns_policy = policy is not None
+
+    def _flush_policy(self):
+        """records the snapshots which the policy set on this record (not inherited from an outer scope) held back"""
+        flush = getattr(self._policy, 'flush', None) if self._owns_policy else None
+        if flush is not None:
+            n = len(self._base)
+            self._put([(Record.Key(key[n:]), value) for key, value in flush()], None, self._sinks)
+
+    def remove_sink(self, sink):
+        """removes a sink and flushes it. Without sinks the record keeps its entries in memory again."""
+        self._set_sinks(tuple(spec for spec in self._sink_specs if spec[0] is not sink))
+        sink.flush()
+
+    def _detach(self):
+        """makes the record of an inner scope independent of the sinks and the policy of the outer scope"""
+        self._base = Record.Key()
+        self._set_sinks(())
+        self._policy = None
+        self._owns_policy = False
+
+    def _set_sinks(self, sink_specs):
+        self._sink_specs = sink_specs
+        self._sinks = tuple(sink for sink, retain in sink_specs)
+        self._retain = not sink_specs or any(retain for sink, retain in sink_specs)
+
+    def _writable_entries(self):
+        if self._sealed:
+            self._entries = self._storage()
+            self._segments.append(((), self._entries))
+            self._sealed = False
+        return self._entries
 
     def _add_entry(self, key_word, value):
-        key = Record.Key(self._prefix_stack) + key_word
-        self._entries[key] = value
+        prefix = self._prefix_key()
+        if isinstance(key_word, str):
+            key = Record.Key(tuple.__add__(prefix, (key_word,)))
+        else:
+            key = prefix + key_word
+        if self._policy is not None:
+            value = self._policy(self._base + key if self._base else key, value)
+            if value is SKIP:
+                return
+        if self._retain:
+            log = self._key_log
+            if log is None:
+                self._writable_entries()[key] = value
+            else:
+                with Record._lock:
+                    mapping = self._writable_entries()
+                    if key not in mapping:
+                        log.append(key)
+                    mapping[key] = value
+        if self._sinks:
+            key = self._base + key if self._base else key
+            for sink in self._sinks:
+                sink.write(key, value)
+
+    def _add_entries(self, items, prefix=()):
+        """adds many entries at once. The keys of `items`, an iterable of key/value pairs, are extended by the present
+        prefix stack and `prefix`, which is looked up only once."""
+        prefix = self._prefix_key() + prefix
+        Key, join = Record.Key, tuple.__add__
+        entries = [(Key(join(prefix, (key_word,))) if isinstance(key_word, str) else prefix + key_word, value)
+                   for key_word, value in items]
+        self._put(entries, self._policy, self._sinks)
+
+    def _put(self, entries, policy, sinks):
+        """applies the policy to a list of key/value pairs, keeps them if the record retains its entries and writes
+        them to the sinks. The policy and the sinks get the keys the entries have in the outer record whose policy and
+        sinks an inner scope inherited."""
+        base = self._base
+        if policy is not None:
+            entries = [(key, value) for key, value in ((key, policy(base + key if base else key, value))
+                                                       for key, value in entries) if value is not SKIP]
+        if self._retain:
+            log = self._key_log
+            if log is None:
+                self._writable_entries().update(entries)
+            else:
+                with Record._lock:
+                    mapping = self._writable_entries()
+                    log.extend(key for key, value in entries if key not in mapping)
+                    mapping.update(entries)
+        if sinks and base:
+            entries = [(base + key, value) for key, value in entries]
+        for sink in sinks:
+            for key, value in entries:
+                sink.write(key, value)
+
+    def record_batch(self, items, prefix=()):
+        """records many values at once if the Record is started. `items` is a dict or an iterable of key/value pairs
+        whose keys are extended by the present prefix stack and `prefix` (a string or a tuple of strings).
+
+        .. code::
+
+            Record().record_batch(zip(dates, cashflows), prefix='cashflows')
+        """
+        if self._started:
+            self._add_entries(items.items() if isinstance(items, dict) else items, prefix)
+
+    def record_array(self, key_word, values, labels=None):
+        """records a one-dimensional sequence, e.g. a numpy array of cashflows, as RecordedArray if the Record is
+        started. The sequence is not copied. In tables made from the record each array becomes a column with a row
+        for each value, labelled by `labels` (by default 0, 1, 2, ...)."""
+        if self._started:
+            self._add_entry(key_word, RecordedArray(values, labels))
 
     def _record(self, *args, **kwargs):
         """This method is invoked when calling Record(*args, **kwargs) and 'Record().is_started'. Arguments can be a dict containing values
         to be recorded and keys that are used to build the keys of the record together with the prefix stack.
         kwargs are used just as a dict which was passed as argument."""
         for arg in [arg for arg in args if isinstance(arg, dict)]:
-            for key, value in list(arg.items()):
-                self._add_entry(key, value)
-        for key, value in list(kwargs.items()):
-            self._add_entry(key, value)
+            self._add_entries(arg.items())
+        if kwargs:
+            self._add_entries(kwargs.items())
 
     def __enter__(self):
         cls = self.__class__
-        cls._record_level += 1
-        rec = cls()
+        frames = cls._frames()
+        outer, prefix = frames[-1]
+        rec = cls._new_record(len(frames), outer._storage)
+        if outer._sink_specs or outer._policy is not None:
+            # the inner scope applies the policy and writes to the sinks with the keys its entries get in the outer
+            # record
+            rec._base = outer._base + prefix
+            rec._set_sinks(outer._sink_specs)
+            rec._policy = outer._policy
+        _scope.set(frames + ((rec, Record.Key()),))
         rec.start()
         return rec
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.stop()
-        rec = self.__class__._records.pop()
-        if self.__class__._record_level > 0:
-            self.__class__._record_level -= 1
+        # only the inner record stops, the outer one may be shared with other tasks or threads which go on recording
+        frames = self.__class__._frames()
+        rec = frames[-1][0]
+        rec._flush_policy()
+        rec.stop()
+        if len(frames) > 1:
+            _scope.set(frames[:-1])
             Record()._extend(rec)
 
-
     def _extend(self, other):
         """A (sub)record can be united with its (parent)record by extending the subrecordkeys with the present state
-        of the parentrecordkeys"""
-        for key, value in list(other.entries.items()):
-            self._add_entry(key, value)
+        of the parentrecordkeys. Unless the record has a policy or sinks which the subrecord did not apply or write to,
+        the entries are not re-keyed one by one here, but the segments of the subrecord are attached with the present
+        prefix stack. They are joined on access to |Record().entries|."""
+        with Record._lock:
+            sinks = tuple(sink for sink in self._sinks if sink not in other._sinks)
+            policy = self._policy if self._policy is not other._policy else None
+            if sinks or policy is not None:
+                prefix = self._prefix_key()
+                self._put([(prefix + key, value) for key, value in other.entries.items()], policy, sinks)
+                return
+            if not self._retain:
+                return
+            prefix = self._prefix_key()
+            segments = [(prefix + key, mapping) for key, mapping in other._segments if mapping]
+            if segments:
+                other._sealed = other._shared = True
+                self._segments.extend(segments)
+                self._sealed = True
+
+    def serialize(self):
+        """returns the entries as compressed bytes, e.g. to send them from a worker process to its parent process.
+        The key parts are stored only once and the keys as tuples of their indices."""
+        parts, index, keys = list(), dict(), list()
+        for key in self.entries:
+            ids = list()
+            for part in key:
+                i = index.get(part)
+                if i is None:
+                    i = index[part] = len(parts)
+                    parts.append(part)
+                ids.append(i)
+            keys.append(tuple(ids))
+        data = parts, keys, list(self.entries.values())
+        return zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    def merge(self, data, prefix=()):
+        """extends the record by entries serialized with |Record().serialize()|. Like in |Record()._extend()| the keys are
+        extended by the present prefix stack and, in addition, by the given prefix (a string or a tuple of strings)."""
+        parts, keys, values = pickle.loads(zlib.decompress(data))
+        with Record._lock:
+            self._add_entries(zip((tuple([parts[i] for i in ids]) for ids in keys), values), prefix)
 
     def __str__(self):
         return "Record({})".format(self._level)
 
 
+class RecordedCall(object):
+    """
+    Wraps a function, e.g. to run it in a worker process of a multiprocessing pool, so that the values recorded
+    during the call are not lost. Calling the wrapper calls the function in a new scope of recording and returns
+    the result of the function together with the recorded entries serialized by |Record().serialize()|.
+    These can be merged into the parent record by |Record().merge(data, prefix)|.
 
+    .. code::
 
+        with ProcessPoolExecutor() as pool:
+            results = pool.map(RecordedCall(value_trade), trades)
 
+        for trade, (value, data) in zip(trades, results):
+            Record().merge(data, prefix=trade.name)
 
+    The function has to be picklable, i.e. defined at the top level of a module.
+    """
 
+    def __init__(self, function):
+        self.function = function
 
-
-
-
-
-
+    def __call__(self, *args, **kwargs):
+        with Record() as rec:
+            # the entries go back to the parent as data only, so the sinks and the policy of the scope do not apply
+            rec._detach()
+            value = self.function(*args, **kwargs)
+            data = rec.serialize()
+            # the entries go back to the parent process only and are not merged into the worker's record
+            rec.clear()
+        return value, data
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+#
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+
+from abc import ABCMeta, abstractmethod
+import csv
+import io
+import json
+import threading
+from six import PY2, string_types, with_metaclass
+
+__all__ = ['Sink', 'JSONLinesSink', 'CSVSink']
+
+
+class Sink(with_metaclass(ABCMeta, object)):
+    """
+    A sink receives the entries of a Record as they are recorded and writes them to a file. Entries are buffered and
+    written in chunks of `buffer_size` entries, so at most `buffer_size` entries are held in memory.
+
+    `file` is either a filename or a file-like object which accepts native strings (|str|). A file opened by the sink
+    is closed by |Sink.close()|.
+
+    .. code::
+
+        with JSONLinesSink('record.jsonl') as sink:
+            with Record() as rec:
+                rec.add_sink(sink, retain=False)
+                ...
+    """
+
+    def __init__(self, file, buffer_size=1000):
+        if isinstance(file, string_types):
+            # csv and json write native strings, i.e. bytes on Python 2
+            self._file = open(file, 'wb') if PY2 else io.open(file, 'w', newline='')
+            self._owns_file = True
+        else:
+            self._file = file
+            self._owns_file = False
+        self.buffer_size = buffer_size
+        self._buffer = list()
+        self._lock = threading.Lock()
+
+    def write(self, key, value):
+        """adds an entry to the buffer and writes the buffer if it is full"""
+        with self._lock:
+            self._buffer.append((key, value))
+            if len(self._buffer) >= self.buffer_size:
+                self._write_buffer()
+
+    def flush(self):
+        """writes all buffered entries"""
+        with self._lock:
+            self._write_buffer()
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self._file.close()
+
+    def _write_buffer(self):
+        if self._buffer:
+            self._write_entries(self._buffer)
+            self._buffer = list()
+
+    @abstractmethod
+    def _write_entries(self, entries):
+        """writes a list of key/value pairs to the file"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _to_json(value):
+    return value.tolist() if hasattr(value, 'tolist') else str(value)
+
+
+class JSONLinesSink(Sink):
+    """writes each entry as a line :code:`{"key": [...], "value": ...}`. Arrays are written as lists, other values
+    which are not JSON serializable as strings."""
+
+    def _write_entries(self, entries):
+        dumps = json.dumps
+        lines = [dumps({'key': list(key), 'value': value}, default=_to_json) for key, value in entries]
+        lines.append('')
+        self._file.write('\n'.join(lines))
+
+
+class CSVSink(Sink):
+    """writes each entry as a csv row of the key (as in |str(Record.Key)|) and the value"""
+
+    def __init__(self, file, buffer_size=1000, separator=';'):
+        super(CSVSink, self).__init__(file, buffer_size)
+        self._writer = csv.writer(self._file, delimiter=separator, lineterminator='\n')
+
+    def _write_entries(self, entries):
+        self._writer.writerows(('|'.join(map(str, key)), value) for key, value in entries)
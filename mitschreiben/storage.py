@@ -0,0 +1,593 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+#
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+
+from array import array
+from itertools import count
+from math import ceil, log, sqrt
+from numbers import Real
+import json
+import os
+import struct
+import sys
+import time
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+from .formatting import DictTree
+from .table import _INT_CODE
+
+__all__ = ['ColumnarEntries', 'AggregatedEntries', 'RunningStatistics', 'QuantileSketch', 'HistoryEntries', 'Series']
+
+_FLOAT, _INT, _OBJECT = 0, 1, 2
+_DELETED = _EMPTY = -1
+_HASH_MASK = 2 ** 31 - 1
+_MAX_INT = 2 ** (8 * array(_INT_CODE).itemsize - 1)
+_MIN_INT = -_MAX_INT
+
+# sequence numbers shared by all HistoryEntries, so series of different scopes can be ordered
+_sequence = count()
+
+_NPY_DESCR = {'d': 'f8', _INT_CODE: 'i{}'.format(array(_INT_CODE).itemsize)}
+
+
+class ColumnarEntries(MutableMapping):
+    """
+    A compact mapping for the entries of a Record. The key parts are interned and the keys are kept as part ids in
+    a single array, with the offset of each key in another one. Float and int values are kept in typed arrays, any
+    other value in a list. Keys are found by a hash table whose slots are an array of row numbers, so an entry of a
+    float or an int value needs no Python object at all (see bench_storage_memory in test/benchmarks.py).
+
+    To use it call |Record().set_storage(ColumnarEntries)|. The keys are returned with the type of the first key
+    added, i.e. as |Record.Key| for a Record.
+
+    The typed arrays support the buffer protocol, e.g. |numpy.frombuffer(entries.floats)| gives a view on
+    all float values without copying them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._key_type = None
+        self.clear()
+        self.update(*args, **kwargs)
+
+    @property
+    def floats(self):
+        """the array of float values (including values of deleted keys or keys whose value changed its type)"""
+        return self._pools[_FLOAT]
+
+    @property
+    def ints(self):
+        """the array of int values (including values of deleted keys or keys whose value changed its type)"""
+        return self._pools[_INT]
+
+    def clear(self):
+        self._parts = list()
+        self._part_ids = dict()
+        # the part ids of the key of row r are _ids[_offsets[r]:_offsets[r + 1]]
+        self._ids = array('I')
+        self._offsets = array(_INT_CODE, [0])
+        self._hashes = array('i')
+        self._kinds = array('b')
+        self._positions = array(_INT_CODE)
+        self._pools = array('d'), array(_INT_CODE), list()
+        # open addressing hash table of rows, a slot of a deleted row is kept until the table is resized
+        self._slots = array('i', [_EMPTY]) * 8
+        self._filled = 0
+        self._size = 0
+
+    def _add_ids(self, key):
+        part_ids = self._part_ids
+        try:
+            return [part_ids[part] for part in key]
+        except KeyError:
+            pass
+        ids = list()
+        for part in key:
+            i = part_ids.get(part)
+            if i is None:
+                i = part_ids[part] = len(self._parts)
+                self._parts.append(part)
+            ids.append(i)
+        return ids
+
+    def _find(self, ids, h):
+        """returns the slot of the row whose key has the part ids `ids` and the hash `h`, or the empty slot for it"""
+        slots, hashes, key_ids, offsets = self._slots, self._hashes, self._ids, self._offsets
+        mask = len(slots) - 1
+        i, perturb = h & mask, h
+        row = slots[i]
+        while row != _EMPTY:
+            if hashes[row] == h and key_ids[offsets[row]:offsets[row + 1]].tolist() == ids:
+                return i
+            perturb >>= 5
+            i = (5 * i + perturb + 1) & mask
+            row = slots[i]
+        return i
+
+    def _resize(self):
+        size = 8
+        while 2 * self._size >= size:
+            size *= 2
+        slots = self._slots = array('i', [_EMPTY]) * size
+        mask = size - 1
+        for row, (kind, h) in enumerate(zip(self._kinds, self._hashes)):
+            if kind != _DELETED:
+                i, perturb = h & mask, h
+                while slots[i] != _EMPTY:
+                    perturb >>= 5
+                    i = (5 * i + perturb + 1) & mask
+                slots[i] = row
+        self._filled = self._size
+
+    def _row(self, key):
+        """returns the row of the key or None"""
+        part_ids = self._part_ids
+        try:
+            ids = [part_ids[part] for part in key]
+        except (KeyError, TypeError):
+            return None
+        row = self._slots[self._find(ids, hash(tuple(ids)) & _HASH_MASK)]
+        if row == _EMPTY or self._kinds[row] == _DELETED:
+            return None
+        return row
+
+    def _key(self, row):
+        parts, offsets = self._parts, self._offsets
+        return self._key_type([parts[i] for i in self._ids[offsets[row]:offsets[row + 1]]])
+
+    def _value(self, row):
+        return self._pools[self._kinds[row]][self._positions[row]]
+
+    def __setitem__(self, key, value):
+        if not isinstance(key, tuple):
+            raise TypeError('keys have to be tuples, not {}'.format(type(key)))
+        if self._key_type is None:
+            self._key_type = type(key)
+        ids = self._add_ids(key)
+        h = hash(tuple(ids)) & _HASH_MASK
+
+        value_type = type(value)
+        if value_type is float:
+            kind = _FLOAT
+        elif value_type is int and _MIN_INT <= value < _MAX_INT:
+            kind = _INT
+        else:
+            kind = _OBJECT
+        pool = self._pools[kind]
+
+        i = self._find(ids, h)
+        slots, kinds = self._slots, self._kinds
+        row = slots[i]
+        if row == _EMPTY or kinds[row] == _DELETED:
+            # a deleted key is added again as a new row
+            if row == _EMPTY:
+                self._filled += 1
+            slots[i] = len(kinds)
+            key_ids = self._ids
+            key_ids.extend(ids)
+            self._offsets.append(len(key_ids))
+            self._hashes.append(h)
+            kinds.append(kind)
+            self._positions.append(len(pool))
+            pool.append(value)
+            self._size += 1
+            if 3 * self._filled >= 2 * len(slots):
+                self._resize()
+        elif kinds[row] == kind:
+            pool[self._positions[row]] = value
+        else:
+            kinds[row] = kind
+            self._positions[row] = len(pool)
+            pool.append(value)
+
+    def __getitem__(self, key):
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        return self._value(row)
+
+    def __delitem__(self, key):
+        row = self._row(key)
+        if row is None:
+            raise KeyError(key)
+        self._kinds[row] = _DELETED
+        self._size -= 1
+
+    def __contains__(self, key):
+        return self._row(key) is not None
+
+    def __iter__(self):
+        for row, kind in enumerate(self._kinds):
+            if kind != _DELETED:
+                yield self._key(row)
+
+    def __len__(self):
+        return self._size
+
+    def items(self):
+        return [(self._key(row), self._value(row)) for row, kind in enumerate(self._kinds) if kind != _DELETED]
+
+    def values(self):
+        return [self._value(row) for row, kind in enumerate(self._kinds) if kind != _DELETED]
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, dict(self.items()))
+
+
+class QuantileSketch(object):
+    """
+    A mergeable sketch to estimate quantiles of a stream of numbers in bounded memory. Values are counted in buckets
+    of logarithmic width, so an estimated quantile differs from the true one by at most `relative_accuracy` (relative
+    to its value). If there are more than `max_buckets` buckets, the buckets of the smallest absolute values are
+    collapsed.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self._gamma = (1. + relative_accuracy) / (1. - relative_accuracy)
+        self._log_gamma = log(self._gamma)
+        self._positive = dict()
+        self._negative = dict()
+        self._zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        if value > 0:
+            buckets = self._positive
+        elif value < 0:
+            buckets, value = self._negative, -value
+        else:
+            self._zeros += 1
+            self.count += 1
+            return
+        i = int(ceil(log(value) / self._log_gamma))
+        buckets[i] = buckets.get(i, 0) + 1
+        self.count += 1
+        if len(buckets) > self.max_buckets:
+            self._collapse(buckets)
+
+    def merge(self, other):
+        for buckets, other_buckets in ((self._positive, other._positive), (self._negative, other._negative)):
+            for i, n in other_buckets.items():
+                buckets[i] = buckets.get(i, 0) + n
+            if len(buckets) > self.max_buckets:
+                self._collapse(buckets)
+        self._zeros += other._zeros
+        self.count += other.count
+
+    def _collapse(self, buckets):
+        keys = sorted(buckets)
+        n = sum(buckets.pop(i) for i in keys[:len(keys) - self.max_buckets + 1])
+        buckets[keys[len(keys) - self.max_buckets]] = n
+
+    def quantile(self, q):
+        """returns an estimate of the q-quantile (0 <= q <= 1)"""
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = 0
+        for i in sorted(self._negative, reverse=True):
+            seen += self._negative[i]
+            if seen > rank:
+                return -2. * self._gamma ** i / (self._gamma + 1.)
+        seen += self._zeros
+        if seen > rank:
+            return 0.
+        for i in sorted(self._positive):
+            seen += self._positive[i]
+            if seen > rank:
+                return 2. * self._gamma ** i / (self._gamma + 1.)
+        return 2. * self._gamma ** max(self._positive) / (self._gamma + 1.)
+
+
+class RunningStatistics(object):
+    """
+    Count, mean, variance, minimum and maximum of a stream of numbers, updated in constant time and memory by
+    Welford's algorithm. Two instances can be merged. Optionally a QuantileSketch estimates the given quantiles.
+    """
+
+    __slots__ = ('count', 'mean', '_m2', 'min', 'max', 'quantiles', 'sketch')
+
+    def __init__(self, quantiles=(), relative_accuracy=0.01):
+        self.count = 0
+        self.mean = 0.
+        self._m2 = 0.
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.quantiles = tuple(quantiles)
+        self.sketch = QuantileSketch(relative_accuracy) if self.quantiles else None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self.sketch is not None:
+            self.sketch.add(value)
+
+    def merge(self, other):
+        """adds the values of other, see Chan et al. for the update of the variance"""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.sketch is not None and other.sketch is not None:
+            self.sketch.merge(other.sketch)
+
+    @property
+    def variance(self):
+        """the sample variance"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.
+
+    @property
+    def std(self):
+        return sqrt(self.variance)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q) if self.sketch is not None else float('nan')
+
+    def to_dict(self):
+        """returns the statistics as a dict, including the quantiles as 'q0.5', 'q0.99', ..."""
+        ret = dict(count=self.count, mean=self.mean, std=self.std, min=self.min, max=self.max)
+        for q in self.quantiles:
+            ret['q{:g}'.format(q)] = self.quantile(q)
+        return ret
+
+    def __str__(self):
+        return 'n={} mean={:.6g} std={:.6g} min={:.6g} max={:.6g}'.format(
+            self.count, self.mean, self.std, self.min, self.max)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self)
+
+
+class AggregatedEntries(MutableMapping):
+    """
+    A mapping for the entries of a Record which keeps running statistics instead of the last value of each key.
+    Each numeric value recorded with a key updates the RunningStatistics of that key; other values are kept as they
+    are. So recording a key a million times needs the memory of a single value.
+
+    .. code::
+
+        with Record() as rec:
+            rec.set_storage(AggregatedEntries)  # or functools.partial(AggregatedEntries, quantiles=(.5, .99))
+            ...
+        rec.entries[key].mean
+
+    Table cells show the statistics in a single line. |AggregatedEntries.to_dict_tree()| gives a DictTree with
+    a key for each statistic instead, so |DictTree.to_tables()| makes tables with a column for each statistic.
+    """
+
+    def __init__(self, quantiles=(), relative_accuracy=0.01):
+        self.quantiles = quantiles
+        self.relative_accuracy = relative_accuracy
+        self._entries = dict()
+
+    def __setitem__(self, key, value):
+        current = self._entries.get(key)
+        if isinstance(value, RunningStatistics):
+            if isinstance(current, RunningStatistics):
+                current.merge(value)
+            else:
+                stats = self._entries[key] = RunningStatistics(self.quantiles, self.relative_accuracy)
+                stats.merge(value)
+        elif isinstance(value, Real) and not isinstance(value, bool):
+            if not isinstance(current, RunningStatistics):
+                current = self._entries[key] = RunningStatistics(self.quantiles, self.relative_accuracy)
+            current.add(value)
+        else:
+            self._entries[key] = value
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __delitem__(self, key):
+        del self._entries[key]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def to_dict_tree(self):
+        """returns a DictTree with keys key + (statistic,) for the statistics of each key"""
+        tree = DictTree()
+        for key, value in self._entries.items():
+            if isinstance(value, RunningStatistics):
+                for name, statistic in value.to_dict().items():
+                    tree[key + (name,)] = statistic
+            else:
+                tree[key] = value
+        return tree
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self._entries)
+
+
+class Series(object):
+    """
+    The values recorded with a key in a HistoryEntries mapping, optionally with a sequence number and a timestamp
+    for each value. Floats (or ints) are kept in a typed array as long as all values are floats (or ints),
+    otherwise in a list.
+    """
+
+    __slots__ = ('values', 'sequence', 'times')
+
+    def __init__(self, sequence=True, timestamps=False):
+        self.values = None
+        self.sequence = array(_INT_CODE) if sequence else None
+        self.times = array('d') if timestamps else None
+
+    def append(self, value):
+        values = self.values
+        value_type = type(value)
+        if values is None:
+            if value_type is float:
+                values = self.values = array('d')
+            elif value_type is int and _MIN_INT <= value < _MAX_INT:
+                values = self.values = array(_INT_CODE)
+            else:
+                values = self.values = list()
+        elif isinstance(values, array) and not (value_type is float if values.typecode == 'd' else
+                                                value_type is int and _MIN_INT <= value < _MAX_INT):
+            # an array would convert the value, e.g. an int to a float
+            values = self.values = list(values)
+        values.append(value)
+        if self.sequence is not None:
+            self.sequence.append(next(_sequence))
+        if self.times is not None:
+            self.times.append(time.time())
+
+    def extend(self, other):
+        if other.values is None:
+            return
+        if self.values is None:
+            self.values = other.values[:]
+        elif isinstance(self.values, array) and isinstance(other.values, array) \
+                and self.values.typecode == other.values.typecode:
+            self.values.extend(other.values)
+        else:
+            self.values = list(self.values)
+            self.values.extend(other.values)
+        for name in ('sequence', 'times'):
+            mine, theirs = getattr(self, name), getattr(other, name)
+            if mine is not None:
+                mine.extend(theirs if theirs is not None and len(theirs) == len(other) else array(mine.typecode,
+                                                                                                [-1] * len(other)))
+
+    def to_numpy(self):
+        """returns the values as numpy array, without copying them if they are kept in a typed array"""
+        import numpy
+        if isinstance(self.values, array):
+            return numpy.frombuffer(self.values, dtype=self.values.typecode)
+        return numpy.array(self.values if self.values is not None else [])
+
+    def __len__(self):
+        return len(self.values) if self.values is not None else 0
+
+    def __iter__(self):
+        return iter(self.values if self.values is not None else ())
+
+    def __getitem__(self, item):
+        return self.values[item]
+
+    def __str__(self):
+        values = list(self.values[:3]) if self.values is not None else []
+        return '[{}{}] (n={})'.format(', '.join(map(str, values)), ', ...' if len(self) > 3 else '', len(self))
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, self)
+
+
+def _write_npy(values, filename):
+    """writes a typed array as .npy file (format version 1.0), which numpy.load can read"""
+    descr = ('<' if sys.byteorder == 'little' else '>') + _NPY_DESCR[values.typecode]
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': ({},), }}".format(descr, len(values))
+    header += ' ' * (-(len(header) + 11) % 64) + '\n'
+    with open(filename, 'wb') as f:
+        f.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)))
+        f.write(header.encode('latin1'))
+        values.tofile(f)
+
+
+class HistoryEntries(MutableMapping):
+    """
+    A mapping for the entries of a Record which keeps all values recorded with a key as a Series instead of only the
+    last one, e.g. the values of each iteration of a solver.
+
+    .. code::
+
+        with Record() as rec:
+            rec.set_storage(HistoryEntries)  # or functools.partial(HistoryEntries, timestamps=True)
+            ...
+        rec.entries.series(key)            # all values recorded with key as array
+        rec.entries.to_files('history')    # one .npy file per key and column
+
+    With sequence=True each value gets a number which is increasing across all keys and scopes, with timestamps=True
+    the time of recording.
+    """
+
+    def __init__(self, sequence=True, timestamps=False):
+        self.sequence = sequence
+        self.timestamps = timestamps
+        self._entries = dict()
+
+    def __setitem__(self, key, value):
+        series = self._entries.get(key)
+        if series is None:
+            series = self._entries[key] = Series(self.sequence, self.timestamps)
+        if isinstance(value, Series):
+            series.extend(value)
+        else:
+            series.append(value)
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __delitem__(self, key):
+        del self._entries[key]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+
+    def series(self, key):
+        """returns the values recorded with key as array (or list, if they are neither all floats nor all ints)"""
+        return self._entries[key].values
+
+    def to_files(self, path):
+        """writes each typed array of each series to a .npy file in path, `<n>.values.npy`, `<n>.sequence.npy` and
+        `<n>.times.npy`, and an index.json file listing the key and the files of each series. Series of other values
+        are written as json lists to `<n>.values.json`."""
+        if path and not os.path.isdir(path):
+            os.makedirs(path)
+        index = list()
+        for n, (key, series) in enumerate(self._entries.items()):
+            files = dict()
+            for name in ('values', 'sequence', 'times'):
+                values = getattr(series, name)
+                if values is None:
+                    continue
+                if isinstance(values, array):
+                    files[name] = '{}.{}.npy'.format(n, name)
+                    _write_npy(values, os.path.join(path, files[name]))
+                else:
+                    files[name] = '{}.{}.json'.format(n, name)
+                    with open(os.path.join(path, files[name]), 'w') as f:
+                        json.dump(values, f, default=str)
+            index.append({'key': list(key), 'files': files})
+        with open(os.path.join(path, 'index.json'), 'w') as f:
+            json.dump(index, f, default=str, indent=1)
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, self._entries)
@@ -10,14 +10,32 @@
 # License:  Apache License 2.0 (see LICENSE file)
 
 
+from array import array
+import csv
+
+from six import StringIO
+
+# typecode of the arrays of ints, 'q' is not available on Python 2
+try:
+    array('q')
+    _INT_CODE = 'q'
+except ValueError:
+    _INT_CODE = 'l'
+
+
 class Table(object):
     """
         A table consist of columns and rows. Each entry has a row and a column key.
+
+        The keys are kept in order in `row_keys` and `col_keys` together with maps from key to position, so
+        membership tests are O(1). The cells are stored sparse, row by row.
     """
 
     def __init__(self, default_value=None, name=None, left_upper=None):
         self.row_keys = []
         self.col_keys = []
+        self._row_index = {}
+        self._col_index = {}
         self._values = {}
         self._default_value = default_value
         self.name = name
@@ -34,27 +52,78 @@ class Table(object):
     def is_empty(self):
         return len(self.row_keys) == 0 or len(self.col_keys) == 0
 
-    def transpose(self):
+    def has_row(self, row_key):
+        return row_key in self._row_index
+
+    def has_column(self, col_key):
+        return col_key in self._col_index
+
+    def _new(self, row_keys, col_keys, values):
+        """returns a table with the attributes of this one, the given keys and the given rows of cells"""
         ret = Table(name=self.name, left_upper=self.left_upper, default_value=self._default_value)
-        for row_key in self.row_keys:
-            for col_key in self.col_keys:
-                ret.append(col_key, row_key, self.get(row_key, col_key))
+        ret.row_keys = row_keys
+        ret.col_keys = col_keys
+        ret._row_index = dict((k, i) for i, k in enumerate(row_keys))
+        ret._col_index = dict((k, i) for i, k in enumerate(col_keys))
+        ret._values = values
         return ret
 
+    def copy(self):
+        return self._new(list(self.row_keys), list(self.col_keys),
+                         dict((row_key, dict(col_dict)) for row_key, col_dict in self._values.items()))
+
+    def transpose(self, copy=True):
+        """returns the transposed table, if not `copy` as a |TableView| on the cells of this table"""
+        if not copy:
+            return TableView(self, self.col_keys, self.row_keys, transposed=True)
+        values = dict((col_key, {}) for col_key in self.col_keys)
+        for row_key, col_dict in self._values.items():
+            for col_key, value in col_dict.items():
+                values[col_key][row_key] = value
+        return self._new(list(self.col_keys), list(self.row_keys), values)
+
+    def _add_row_key(self, row_key):
+        self._row_index[row_key] = len(self.row_keys)
+        self.row_keys.append(row_key)
+        col_dict = self._values[row_key] = {}
+        return col_dict
+
+    def _add_col_key(self, col_key):
+        self._col_index[col_key] = len(self.col_keys)
+        self.col_keys.append(col_key)
 
     def append(self, row_key, col_key, value):
-        col_dict = self._values.get(row_key, None)
+        col_dict = self._values.get(row_key)
         if col_dict is None:
-            self._values[row_key] = {col_key: value}
-            self.row_keys.append(row_key)
-        else:
-            col_dict[col_key] = value
-        if col_key not in self.col_keys:
-            self.col_keys.append(col_key)
+            col_dict = self._add_row_key(row_key)
+        col_dict[col_key] = value
+        if col_key not in self._col_index:
+            self._add_col_key(col_key)
 
     def append_row(self, row_key, row):
-        for col_key, value in list(row.items()):
-            self.append(row_key, col_key, value)
+        col_dict = self._values.get(row_key)
+        if col_dict is None:
+            col_dict = self._add_row_key(row_key)
+        col_dict.update(row)
+        col_index = self._col_index
+        for col_key in row:
+            if col_key not in col_index:
+                self._add_col_key(col_key)
+
+    def append_column(self, col_key, values, row_keys=None):
+        """appends a column of values, by default with row keys 0, 1, 2, ... Sequences with a `tolist` method, like
+        numpy arrays or array.array, are converted in bulk."""
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+        if row_keys is None:
+            row_keys = range(len(values))
+        if col_key not in self._col_index:
+            self._add_col_key(col_key)
+        for row_key, value in zip(row_keys, values):
+            col_dict = self._values.get(row_key)
+            if col_dict is None:
+                col_dict = self._add_row_key(row_key)
+            col_dict[col_key] = value
 
     def get(self, row_key, col_key):
         row_dict = self._values.get(row_key, None)
@@ -67,92 +136,135 @@ class Table(object):
         return self.get(row_key, col_key)
 
     def get_row(self, row_key):
-        ret = {}
-        for col_key in self.col_keys:
-            ret[col_key] = self.get(row_key, col_key)
-        return ret
+        return dict(zip(self.col_keys, self.get_row_list(row_key, self.col_keys)))
 
     def get_row_list(self, row_key, col_keys):
         """
         returns the values of the row:row_key for all col_keys.
         """
-        return [self(row_key, col_key) for col_key in col_keys]
+        row_dict = self._values.get(row_key)
+        if row_dict is None:
+            return [self._default_value] * len(col_keys)
+        default = self._default_value
+        return [row_dict.get(col_key, default) for col_key in col_keys]
 
     def get_column(self, col_key):
-        ret = {}
-        for row_key in self.row_keys:
-            ret[row_key] = self.get(row_key, col_key)
-        return ret
+        default = self._default_value
+        values = self._values
+        return {row_key: values[row_key].get(col_key, default) for row_key in self.row_keys}
 
     def get_default(self):
         return self._default_value
 
-    def sort(self, row_compare=None, column_compare=None):
-        ret = Table(name=self.name, left_upper=self.left_upper, default_value=self._default_value)
+    def sort(self, row_compare=None, column_compare=None, copy=True):
+        """returns the table with sorted rows and columns, if not `copy` as a |TableView| on the cells of this table"""
         sortrow_keys = sorted(self.row_keys, key=row_compare)
         sortcol_keys = sorted(self.col_keys, key=column_compare)
-        for row_key in sortrow_keys:
-            for col_key in sortcol_keys:
-                ret.append(row_key, col_key, self.get(row_key, col_key))
-        return ret
+        if not copy:
+            return TableView(self, sortrow_keys, sortcol_keys)
+        values = dict((row_key, dict(self._values[row_key])) for row_key in sortrow_keys)
+        return self._new(sortrow_keys, sortcol_keys, values)
+
+    def select(self, col_keys=None, row_keys=None):
+        """returns a |TableView| on the given columns and rows of the table, by default all of them"""
+        return TableView(self, self.row_keys if row_keys is None else row_keys,
+                         self.col_keys if col_keys is None else col_keys)
 
     def to_csv(self, leftUpper=None, tabName=None, separator=';'):
-        repr = list()
+        stream = StringIO()
+        self.write_csv(stream, separator)
+        return stream.getvalue()
+
+    def write_csv(self, stream, separator=';', float_format=None, quoting=False, rows_per_write=1000):
+        """writes the table as by |Table.to_csv()| into a file-like object, block by block of `rows_per_write` rows.
+
+        `float_format` is a format string like '{:.6f}' or '%.6f' or a function used for floats instead of str.
+        With `quoting` the rows are written by the csv module, which quotes cells containing the (single character)
+        separator, quotes or line breaks, and ends every row with a line break."""
         col_keys = sorted(self.col_keys)
-        repr.append(""+separator+separator.join(col_keys))
-        for key in self.row_keys:
-            elements = [key]+self.get_row_list(key, col_keys)
-            elements = list(map(str, elements))
-            repr.append(separator.join(elements))
-        return "\n".join(repr)
-
-    def pretty_string(self, leftUpper=None, tabName=None, separator=" | "):
-        representation = []
+        if float_format is None:
+            fmt = None
+        elif callable(float_format):
+            fmt = float_format
+        elif '{' in float_format:
+            fmt = float_format.format
+        else:
+            fmt = float_format.__mod__
+
+        def cells(row_key):
+            values = self.get_row_list(row_key, col_keys)
+            if fmt is None:
+                return [str(row_key)] + list(map(str, values))
+            return [str(row_key)] + [fmt(v) if isinstance(v, float) else str(v) for v in values]
+
+        header = [""] + list(map(str, col_keys))
+        if quoting:
+            writer = csv.writer(stream, delimiter=separator, lineterminator='\n')
+            writer.writerow(header)
+        else:
+            stream.write(separator.join(header))
+        row_keys = self.row_keys
+        for start in range(0, len(row_keys), rows_per_write):
+            block = [cells(row_key) for row_key in row_keys[start:start + rows_per_write]]
+            if quoting:
+                writer.writerows(block)
+            else:
+                stream.write("".join("\n" + separator.join(row) for row in block))
+
+    def pretty_string(self, leftUpper=None, tabName=None, separator=" | ", max_rows=None, max_cols=None):
+        stream = StringIO()
+        self.write_pretty(stream, leftUpper, tabName, separator, max_rows, max_cols)
+        return stream.getvalue()
+
+    def write_pretty(self, stream, leftUpper=None, tabName=None, separator=" | ", max_rows=None, max_cols=None):
+        """writes the table as by |Table.pretty_string()| line by line into a file-like object.
+
+        Of a table with more than `max_rows` rows or `max_cols` columns only the first and the last ones are shown,
+        the others are elided by a row or column of '...'. Each cell shown is turned into a string only once."""
         name = tabName if tabName is not None else self.name
         if name is not None:
-            representation.append(name)
-
+            stream.write(str(name) + "\n")
         if len(self.row_keys) == 0 or len(self.col_keys) == 0:
-            return '\n'.join(representation + ['Empty Table'])
-        tab = self
-        line = leftUpper if leftUpper is not None else (self.left_upper if self.left_upper is not None else '')
-        max_row_key_width = max(list(map(len, list(map(str,tab.row_keys)) + [line])))
-        line = "{text:>{len}}".format(text=line, len=max_row_key_width)
-        max_colkey_width = dict()
-        for col_key in tab.col_keys:
-            max_colkey_width[col_key] = max([len(str(x)) for x in list(tab.get_column(col_key).values()) + [col_key]])
-        for col_key in tab.col_keys:
-            line += "{sep}{col:>{width}}".format(sep=separator, col=col_key, width=max_colkey_width[col_key])
-        representation.append(line)
-        for row_key in tab.row_keys:
-            line = "{ROW:>{len}}".format(ROW=row_key, len=max_row_key_width)
-            for col_key in tab.col_keys:
-                element = str(tab.get(row_key, col_key))
-                line += "{sep}{ELEMENT:>{width}}".format(ELEMENT=element, sep = separator, width = max_colkey_width[col_key])
-            representation.append(line)
-        return '\n'.join(representation)
+            stream.write('Empty Table')
+            return
+
+        row_keys, row_gap = _elide(self.row_keys, max_rows)
+        col_keys, col_gap = _elide(self.col_keys, max_cols)
+        row_names = list(map(str, row_keys))
+        col_names = list(map(str, col_keys))
+        cells = [list(map(str, self.get_row_list(row_key, col_keys))) for row_key in row_keys]
+        if col_gap is not None:
+            col_names.insert(col_gap, '...')
+            for row in cells:
+                row.insert(col_gap, '...')
+        if row_gap is not None:
+            row_names.insert(row_gap, '...')
+            cells.insert(row_gap, ['...'] * len(col_names))
+
+        corner = leftUpper if leftUpper is not None else (self.left_upper if self.left_upper is not None else '')
+        corner = str(corner)
+        row_width = max(len(corner), max(map(len, row_names)))
+        widths = list(map(len, col_names))
+        for row in cells:
+            widths = list(map(max, widths, map(len, row)))
+
+        stream.write(corner.rjust(row_width) + "".join(separator + c.rjust(w) for c, w in zip(col_names, widths)))
+        for row_name, row in zip(row_names, cells):
+            stream.write("\n" + row_name.rjust(row_width) + "".join(separator + c.rjust(w) for c, w in zip(row, widths)))
+
+    def iter_html(self):
+        """yields the html representation of the table chunk by chunk, one chunk per row"""
+        col_keys = self.col_keys
+        yield "<table>\n<tr class='headrow'>\n<th colspan='{number}'>{tabname}</th>\n</tr>\n".format(
+            number=len(col_keys) + 1, tabname=self.name)
+        yield "<tr class='bodyrow'>\n<th> </th>\n" + "".join("<th>{}</th>\n".format(c) for c in col_keys) + "</tr>\n"
+        for row_key in self.row_keys:
+            yield "<tr class='bodyrow'>\n<th>{}</th>\n".format(row_key) \
+                  + "".join("<td>{}</td>\n".format(v) for v in self.get_row_list(row_key, col_keys)) + "</tr>"
+        yield "</table>"
 
     def to_html(self):
-        rows = self.to_nested_list()
-        s = "<table>\n"
-        s += "<tr class='headrow'>\n"
-        s += "<th colspan='{number}'>{tabname}</th>\n".format(number=len(rows[0]), tabname = self.name)
-        s += "</tr>\n"
-        header = rows[0]
-        s += "<tr class='bodyrow'>\n"
-        for cell in header:
-            s += "<th>{}</th>\n".format(cell)
-        s += "</tr>\n"
-
-        for row in rows[1:]:
-            s += "<tr class='bodyrow'>\n"
-            s += "<th>{}</th>\n".format(row[0])
-            for cell in row[1:]:
-                s += "<td>{}</td>\n".format(cell)
-            s +="</tr>"
-
-        s+="</table>"
-        return s
+        return "".join(self.iter_html())
 
     def to_nested_list(self):
         """returns the table as a nested list rows"""
@@ -165,6 +277,48 @@ class Table(object):
             rows.append(row)
         return rows
 
+    def to_numpy(self, col_key=None):
+        """returns the values of a column or, if no column is given, the rows of all values as numpy array"""
+        import numpy
+        if col_key is None:
+            return numpy.array([self.get_row_list(row_key, self.col_keys) for row_key in self.row_keys])
+        column = self.get_column(col_key)
+        return numpy.array([column[row_key] for row_key in self.row_keys])
+
+    @classmethod
+    def from_columns(cls, columns, row_keys=None, **kwargs):
+        """builds a table from a mapping (or a sequence of pairs) of column keys and sequences of values, which have
+        the row keys `row_keys`, by default 0, 1, 2, ..."""
+        ret = cls(**kwargs)
+        for col_key, values in (columns.items() if hasattr(columns, 'items') else columns):
+            ret.append_column(col_key, values, row_keys)
+        return ret
+
+    @classmethod
+    def from_array(cls, values, row_keys=None, col_keys=None, **kwargs):
+        """builds a table from a two dimensional numpy array or a sequence of rows, by default with row and column
+        keys 0, 1, 2, ... The columns of a numpy array are taken as views, not copied, by a |ColumnTable|."""
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+        if row_keys is None:
+            row_keys = range(len(values))
+        if col_keys is None:
+            col_keys = range(len(values[0]) if len(values) else 0)
+        ret = cls(**kwargs)
+        for col_key in col_keys:
+            ret._add_col_key(col_key)
+        for row_key, row in zip(row_keys, values):
+            ret.append_row(row_key, dict(zip(col_keys, row)))
+        return ret
+
+    @classmethod
+    def from_cells(cls, cells, **kwargs):
+        """builds a table from triples of row key, column key and value, e.g. entries of a record grouped by prefix"""
+        ret = cls(**kwargs)
+        for row_key, col_key, value in cells:
+            ret.append(row_key, col_key, value)
+        return ret
+
     @staticmethod
     def create_from_json_dict(json_dict):
         ret = Table(name=json_dict['TableName'], left_upper=json_dict['LeftUpper'])
@@ -177,3 +331,329 @@ class Table(object):
                 ret.append(first_col[r], header[c], row[c + 1])
         return ret
 
+
+class TableView(Table):
+    """
+        A table presenting the cells of another table transposed, in another order or only some of its rows and
+        columns without copying them. The view shares the cells of the table, so the table should not be changed while
+        the view is in use. On the first change of the view itself, it becomes a table of its own.
+    """
+
+    def __init__(self, table, row_keys, col_keys, transposed=False):
+        super(TableView, self).__init__(table.get_default(), table.name, table.left_upper)
+        row_keys, col_keys = list(row_keys), list(col_keys)
+        if isinstance(table, TableView) and table._table is not None:
+            rows, cols = (table._col_index, table._row_index) if transposed else (table._row_index, table._col_index)
+            # a view on a view reads the cells of the underlying table, unless the other view hides some of its rows or
+            # columns
+            if all(k in rows for k in row_keys) and all(k in cols for k in col_keys):
+                transposed = transposed != table._transposed
+                table = table._table
+        self._table = table
+        self._transposed = transposed
+        self.row_keys = row_keys
+        self.col_keys = col_keys
+        self._row_index = dict((k, i) for i, k in enumerate(self.row_keys))
+        self._col_index = dict((k, i) for i, k in enumerate(self.col_keys))
+        self._values = None
+
+    def _cells(self):
+        """yields row key, column key and value of the cells of the table which are seen by the view"""
+        values = self._table._values
+        if values is None:
+            for row_key in self.row_keys:
+                for col_key, value in zip(self.col_keys, self.get_row_list(row_key, self.col_keys)):
+                    yield row_key, col_key, value
+        elif self._transposed:
+            for col_key in self.col_keys:
+                for row_key, value in values.get(col_key, {}).items():
+                    if row_key in self._row_index:
+                        yield row_key, col_key, value
+        else:
+            for row_key in self.row_keys:
+                for col_key, value in values.get(row_key, {}).items():
+                    if col_key in self._col_index:
+                        yield row_key, col_key, value
+
+    def _view_values(self):
+        values = dict((row_key, {}) for row_key in self.row_keys)
+        for row_key, col_key, value in self._cells():
+            values[row_key][col_key] = value
+        return values
+
+    def _materialize(self):
+        if self._table is not None:
+            self._values = self._view_values()
+            self._table = None
+
+    def copy(self):
+        if self._table is None:
+            return super(TableView, self).copy()
+        return self._new(list(self.row_keys), list(self.col_keys), self._view_values())
+
+    def transpose(self, copy=True):
+        view = TableView(self, self.col_keys, self.row_keys, transposed=True)
+        return view.copy() if copy else view
+
+    def sort(self, row_compare=None, column_compare=None, copy=True):
+        view = TableView(self, sorted(self.row_keys, key=row_compare), sorted(self.col_keys, key=column_compare))
+        return view.copy() if copy else view
+
+    def append(self, row_key, col_key, value):
+        self._materialize()
+        super(TableView, self).append(row_key, col_key, value)
+
+    def append_row(self, row_key, row):
+        self._materialize()
+        super(TableView, self).append_row(row_key, row)
+
+    def append_column(self, col_key, values, row_keys=None):
+        self._materialize()
+        super(TableView, self).append_column(col_key, values, row_keys)
+
+    def get(self, row_key, col_key):
+        if self._table is None:
+            return super(TableView, self).get(row_key, col_key)
+        if row_key not in self._row_index or col_key not in self._col_index:
+            return self._default_value
+        if self._transposed:
+            return self._table.get(col_key, row_key)
+        return self._table.get(row_key, col_key)
+
+    def get_row_list(self, row_key, col_keys):
+        if self._table is None:
+            return super(TableView, self).get_row_list(row_key, col_keys)
+        default, col_index = self._default_value, self._col_index
+        if row_key not in self._row_index:
+            return [default] * len(col_keys)
+        if self._transposed:
+            values = self._table._values
+            if values is None:
+                row = [self._table.get(col_key, row_key) for col_key in col_keys]
+            else:
+                row = [values.get(col_key, {}).get(row_key, default) for col_key in col_keys]
+        else:
+            row = self._table.get_row_list(row_key, col_keys)
+        # the cells of columns which are not in the view are not seen
+        return [value if col_key in col_index else default for col_key, value in zip(col_keys, row)]
+
+    def get_column(self, col_key):
+        if self._table is None:
+            return super(TableView, self).get_column(col_key)
+        values, default = self._table._values, self._default_value
+        if col_key not in self._col_index:
+            return dict((row_key, default) for row_key in self.row_keys)
+        if values is None:
+            column = self._table.get_row(col_key) if self._transposed else self._table.get_column(col_key)
+            return {row_key: column.get(row_key, default) for row_key in self.row_keys}
+        if self._transposed:
+            row_dict = values.get(col_key, {})
+            return {row_key: row_dict.get(row_key, default) for row_key in self.row_keys}
+        return {row_key: values.get(row_key, {}).get(col_key, default) for row_key in self.row_keys}
+
+
+def _elide(keys, n):
+    """returns the first and the last of the keys, `n` in total, and the position of the gap between them"""
+    if n is None or len(keys) <= n:
+        return keys, None
+    head = (n + 1) // 2
+    return list(keys[:head]) + list(keys[len(keys) - (n - head):]), head
+
+
+def _typed_column(values):
+    """returns the values as array of floats or of ints if they are all floats or all ints, otherwise as list"""
+    types = set(map(type, values))
+    if types == {float}:
+        return array('d', values)
+    if types == {int}:
+        try:
+            return array(_INT_CODE, values)
+        except OverflowError:
+            pass
+    return list(values)
+
+
+class ColumnTable(Table):
+    """
+        A table which stores its cells column by column, each column as a sequence along the row keys.
+
+        Columns of only floats or only ints are kept in typed arrays. Columns given in bulk as numpy arrays or
+        array.array are kept as they are, without copy, until a cell of the column is changed. So these columns are
+        exported without copy, too, by |ColumnTable.to_numpy()| and |ColumnTable.column_buffer()|.
+    """
+
+    def __init__(self, default_value=None, name=None, left_upper=None):
+        super(ColumnTable, self).__init__(default_value, name, left_upper)
+        self._columns = {}
+        self._values = None
+
+    @classmethod
+    def from_array(cls, values, row_keys=None, col_keys=None, **kwargs):
+        if hasattr(values, 'shape'):
+            columns = [values[:, j] for j in range(values.shape[1])]
+        else:
+            columns = list(zip(*values))
+        if col_keys is None:
+            col_keys = range(len(columns))
+        return cls.from_columns(zip(col_keys, columns), row_keys, **kwargs)
+
+    def _empty(self):
+        return ColumnTable(name=self.name, left_upper=self.left_upper, default_value=self._default_value)
+
+    def _add_row_key(self, row_key):
+        self._row_index[row_key] = len(self.row_keys)
+        self.row_keys.append(row_key)
+
+    def _add_col_key(self, col_key):
+        super(ColumnTable, self)._add_col_key(col_key)
+        self._columns[col_key] = []
+
+    def _writable(self, col_key):
+        column = self._columns[col_key]
+        if not isinstance(column, list):
+            column = self._columns[col_key] = column.tolist() if hasattr(column, 'tolist') else list(column)
+        return column
+
+    def _set(self, i, col_key, value):
+        column = self._writable(col_key)
+        n = len(column)
+        if i < n:
+            column[i] = value
+        else:
+            column.extend([self._default_value] * (i - n))
+            column.append(value)
+
+    def append(self, row_key, col_key, value):
+        i = self._row_index.get(row_key)
+        if i is None:
+            i = len(self.row_keys)
+            self._add_row_key(row_key)
+        if col_key not in self._col_index:
+            self._add_col_key(col_key)
+        self._set(i, col_key, value)
+
+    def append_row(self, row_key, row):
+        for col_key, value in list(row.items()):
+            self.append(row_key, col_key, value)
+
+    def append_column(self, col_key, values, row_keys=None):
+        """appends a column of values, by default with row keys 0, 1, 2, ... If the row keys are the row keys of
+        the table (followed by new ones) the values are stored as a whole, numpy arrays and array.array without copy."""
+        if isinstance(values, (list, tuple)):
+            values = _typed_column(values)
+        row_keys = list(range(len(values)) if row_keys is None else row_keys)
+        n = len(self.row_keys)
+        new_row_keys = row_keys[n:]
+        if col_key not in self._col_index and len(values) == len(row_keys) \
+                and row_keys[:n] == self.row_keys[:len(row_keys)] \
+                and len(set(new_row_keys)) == len(new_row_keys) \
+                and not any(row_key in self._row_index for row_key in new_row_keys):
+            for row_key in new_row_keys:
+                self._add_row_key(row_key)
+            self._add_col_key(col_key)
+            self._columns[col_key] = values
+            return
+        for row_key, value in zip(row_keys, values):
+            self.append(row_key, col_key, value)
+
+    def get(self, row_key, col_key):
+        i = self._row_index.get(row_key)
+        column = self._columns.get(col_key)
+        if i is None or column is None or i >= len(column):
+            return self._default_value
+        return column[i]
+
+    def get_row_list(self, row_key, col_keys):
+        i = self._row_index.get(row_key)
+        default = self._default_value
+        if i is None:
+            return [default] * len(col_keys)
+        columns = self._columns
+        ret = list()
+        for col_key in col_keys:
+            column = columns.get(col_key)
+            ret.append(default if column is None or i >= len(column) else column[i])
+        return ret
+
+    def get_column(self, col_key):
+        column = self._columns.get(col_key, ())
+        values = column.tolist() if hasattr(column, 'tolist') else column
+        n, default = len(values), self._default_value
+        return {row_key: values[i] if i < n else default for i, row_key in enumerate(self.row_keys)}
+
+    def _reordered(self, row_keys, col_keys):
+        """returns a copy of the table with the rows and columns in the given order"""
+        ret = self._empty()
+        positions = [self._row_index[row_key] for row_key in row_keys]
+        default = self._default_value
+        for row_key in row_keys:
+            ret._add_row_key(row_key)
+        for col_key in col_keys:
+            column = self._columns[col_key]
+            ret._add_col_key(col_key)
+            if len(column) < len(positions):
+                column = list(column.tolist() if hasattr(column, 'tolist') else column)
+                column.extend([default] * (len(positions) - len(column)))
+            if hasattr(column, 'take'):
+                ret._columns[col_key] = column.take(positions)
+            elif isinstance(column, array):
+                ret._columns[col_key] = array(column.typecode, [column[i] for i in positions])
+            else:
+                ret._columns[col_key] = [column[i] for i in positions]
+        return ret
+
+    def copy(self):
+        return self._reordered(self.row_keys, self.col_keys)
+
+    def transpose(self, copy=True):
+        if not copy:
+            return TableView(self, self.col_keys, self.row_keys, transposed=True)
+        ret = self._empty()
+        for row_key in self.row_keys:
+            ret.append_column(row_key, self.get_row_list(row_key, self.col_keys), self.col_keys)
+        return ret
+
+    def sort(self, row_compare=None, column_compare=None, copy=True):
+        sortrow_keys = sorted(self.row_keys, key=row_compare)
+        sortcol_keys = sorted(self.col_keys, key=column_compare)
+        if not copy:
+            return TableView(self, sortrow_keys, sortcol_keys)
+        return self._reordered(sortrow_keys, sortcol_keys)
+
+    def _packed(self, col_key):
+        """returns the column filled up to all rows, as typed array if it holds only floats or only ints"""
+        column = self._columns[col_key]
+        if len(column) < len(self.row_keys):
+            column = self._writable(col_key)
+            column.extend([self._default_value] * (len(self.row_keys) - len(column)))
+        if isinstance(column, list):
+            column = _typed_column(column)
+            if not isinstance(column, list):
+                self._columns[col_key] = column
+        return column
+
+    def column_buffer(self, col_key):
+        """returns a memoryview on the values of a column of only floats or only ints (on Python 2 a buffer object
+        for columns kept in an array.array, which does not support memoryview there)"""
+        column = self._packed(col_key)
+        if isinstance(column, list):
+            raise TypeError('column {!r} holds other values than only floats or only ints'.format(col_key))
+        try:
+            return memoryview(column)
+        except TypeError:
+            return buffer(column)
+
+    def to_numpy(self, col_key=None):
+        """returns the values of a column or, if no column is given, the rows of all values as numpy array.
+        Columns of floats or ints and columns given as numpy arrays are returned without copy."""
+        import numpy
+        if col_key is None:
+            if not self.col_keys:
+                return numpy.array([[] for _ in self.row_keys])
+            return numpy.column_stack([self.to_numpy(c) for c in self.col_keys])
+        if col_key not in self._columns:
+            return numpy.array([self._default_value] * len(self.row_keys))
+        column = self._packed(col_key)
+        if isinstance(column, array):
+            return numpy.frombuffer(column, column.typecode) if len(column) else numpy.zeros(0, column.typecode)
+        return numpy.asarray(column)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+# 
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+# tests of asyncio tasks, which need Python 3.7 and are imported by unittests.py
+
+import asyncio
+import unittest
+import sys
+
+sys.path.append('.')
+sys.path.append('..')
+
+from mitschreiben import Record
+
+
+class TaskRecordTest(unittest.TestCase):
+    """Testing scopes of concurrent asyncio tasks"""
+
+    def setUp(self):
+        Record().clear()
+
+    def test_tasks(self):
+        results = dict()
+
+        async def record_values(name):
+            with Record() as rec:
+                with Record().append_prefix(name):
+                    for i in range(50):
+                        Record({'v%d' % i: name})
+                        await asyncio.sleep(0)
+                results[name] = dict(rec.entries)
+
+        async def main():
+            await asyncio.gather(*[record_values('task%d' % n) for n in range(20)])
+
+        with Record() as outer:
+            asyncio.run(main())
+
+        for name, entries in results.items():
+            self.assertEqual(len(entries), 50)
+            self.assertEqual(set(key[0] for key in entries), {name})
+        self.assertEqual(len(outer.entries), 20 * 50)
+        self.assertEqual(len(Record().entries), 20 * 50)
+
+    def test_sibling_scope(self):
+        async def direct():
+            for i in range(5):
+                Record({'direct%d' % i: i})
+                await asyncio.sleep(0)
+
+        async def scoped():
+            with Record():
+                Record(inner=1)
+                await asyncio.sleep(0)
+
+        async def main():
+            await asyncio.gather(direct(), scoped())
+
+        with Record() as outer:
+            asyncio.run(main())
+            # leaving the scope of one task does not stop the record of the others
+            self.assertTrue(outer.is_started)
+
+        self.assertEqual(sorted(outer.entries), sorted([('direct%d' % i,) for i in range(5)] + [('inner',)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
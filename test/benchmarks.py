@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+
+# mitschreiben
+# ------------
+# Python library supplying a tool to record values during calculations
+#
+# Author:   sonntagsgesicht, based on a fork of Deutsche Postbank [pbrisk]
+# Version:  0.3, copyright Wednesday, 18 September 2019
+# Website:  https://github.com/sonntagsgesicht/mitschreiben
+# License:  Apache License 2.0 (see LICENSE file)
+
+
+from datetime import datetime
+from timeit import timeit
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append('.')
+sys.path.append('..')
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+from mitschreiben import Record, DictTree, Table
+from mitschreiben.table import ColumnTable
+from mitschreiben.storage import ColumnarEntries
+
+
+# dummy functions to benchmark
+
+
+def kernel(x, y):
+    return x * y + 1.
+
+
+@Record.Prefix()
+def decorated_kernel(x, y):
+    return x * y + 1.
+
+
+def synthetic_tree(size):
+    """builds a DictTree of `size` entries with keys like ('book1', 'trade12', 'leg3', 'cf7')"""
+    tree = DictTree()
+    for i in range(size):
+        tree['book%d' % (i // 100000), 'trade%d' % (i // 100), 'leg%d' % (i // 10 % 10), 'cf%d' % (i % 10)] = float(i)
+    return tree
+
+
+# Benchmark section
+
+
+def bench_prefix_overhead(number=1000000):
+    """compares calls of a Record.Prefix decorated function to calls of the undecorated function"""
+    print('Record.Prefix overhead, {} calls'.format(number))
+    plain = timeit(lambda: kernel(1., 2.), number=number)
+    print('  undecorated               {:8.3f}s'.format(plain))
+
+    Record.Prefix.fast_path(False)
+    slow = timeit(lambda: decorated_kernel(1., 2.), number=number)
+    print('  decorated                 {:8.3f}s  ({:6.2f}x)'.format(slow, slow / plain))
+
+    Record.Prefix.fast_path(True)
+    fast = timeit(lambda: decorated_kernel(1., 2.), number=number)
+    print('  decorated with fast path  {:8.3f}s  ({:6.2f}x)'.format(fast, fast / plain))
+    Record.Prefix.fast_path(False)
+
+
+def bench_to_tables(sizes=(10000, 100000, 1000000)):
+    """times DictTree.to_tables on synthetic records of growing size"""
+    print('DictTree.to_tables')
+    for size in sizes:
+        tree = synthetic_tree(size)
+        seconds = timeit(tree.to_tables, number=1)
+        print('  {:>8} keys  {:8.3f}s  ({:6.2f}us per key)'.format(size, seconds, 1e6 * seconds / size))
+
+
+def bench_nested_scopes(depths=(1, 10, 100), size=10000):
+    """times recording `size` values in the innermost of `depth` nested scopes, including the merge on exit"""
+
+    def nest(depth):
+        if depth:
+            with Record():
+                with Record().append_prefix('level%d' % depth):
+                    nest(depth - 1)
+        else:
+            for i in range(size):
+                Record({'key%d' % i: float(i)})
+
+    print('nested Record scopes, {} values'.format(size))
+    for depth in depths:
+        Record().clear()
+        seconds = timeit(lambda: nest(depth), number=1)
+        entries_seconds = timeit(lambda: Record().entries, number=1)
+        print('  depth {:>4}  {:8.3f}s  (entries {:8.3f}s)'.format(depth, seconds, entries_seconds))
+    Record().clear()
+
+
+def bench_recording(size=100000):
+    """times recording `size` values one by one and as a batch under a prefix stack of depth 3"""
+    print('recording {} values'.format(size))
+    keys = ['key%d' % i for i in range(size)]
+    values = [float(i) for i in range(size)]
+
+    def one_by_one():
+        for key, value in zip(keys, values):
+            Record({key: value})
+
+    def batch():
+        Record().record_batch(zip(keys, values))
+
+    for name, run in (('one by one', one_by_one), ('batch', batch)):
+        with Record():
+            with Record().append_prefix('a'), Record().append_prefix('b'), Record().append_prefix('c'):
+                seconds = timeit(run, number=1)
+        print('  {:<12}  {:8.3f}s'.format(name, seconds))
+    Record().clear()
+
+
+def bench_csv_export(size=1000000, workers=(None, 4)):
+    """times DictTree.to_csv_files of a synthetic record of `size` keys serially and by pools of threads and
+    processes"""
+    print('DictTree.to_csv_files, {} keys'.format(size))
+    tree = synthetic_tree(size)
+    path = tempfile.mkdtemp()
+    try:
+        for worker in workers:
+            for processes in ((False, True) if worker else (False,)):
+                name = 'serial' if not worker else '{} {}'.format(worker, 'processes' if processes else 'threads')
+                seconds = timeit(lambda: tree.to_csv_files(path, worker, processes), number=1)
+                print('  {:<12}  {:8.3f}s  ({} files)'.format(name, seconds, len(os.listdir(path))))
+    finally:
+        shutil.rmtree(path)
+
+
+def bench_table(size=1000):
+    """times building a `size` x `size` Table cell by cell, transposing, sorting and reading all columns"""
+    print('Table, {0} x {0} cells'.format(size))
+    table = Table()
+
+    def build():
+        for i in range(size):
+            for j in range(size):
+                table.append('row%d' % i, 'col%d' % j, float(i * j))
+
+    for name, run in (('append', build),
+                      ('transpose', table.transpose),
+                      ('sort', table.sort),
+                      ('get_column', lambda: [table.get_column(c) for c in table.col_keys])):
+        print('  {:<12}  {:8.3f}s'.format(name, timeit(run, number=1)))
+
+
+def bench_column_table(size=1000):
+    """compares building a `size` x `size` Table cell by cell to building it in bulk, with and without ColumnTable"""
+    print('bulk construction of a {0} x {0} table'.format(size))
+    rows = [[float(i * j) for j in range(size)] for i in range(size)]
+
+    def cell_by_cell():
+        table = Table()
+        for i, row in enumerate(rows):
+            for j, value in enumerate(row):
+                table.append(i, j, value)
+
+    for name, run in (('cell by cell', cell_by_cell),
+                      ('Table.from_array', lambda: Table.from_array(rows)),
+                      ('ColumnTable.from_array', lambda: ColumnTable.from_array(rows))):
+        print('  {:<24}  {:8.3f}s'.format(name, timeit(run, number=1)))
+
+    table = ColumnTable.from_array(rows)
+    seconds = timeit(lambda: [table.column_buffer(j) for j in table.col_keys], number=1)
+    print('  {:<24}  {:8.3f}s'.format('column_buffer', seconds))
+
+
+def bench_write_csv(size=1000):
+    """compares Table.to_csv to Table.write_csv into a file for a `size` x `size` table of floats"""
+    print('csv export of a {0} x {0} table'.format(size))
+    table = ColumnTable.from_array([[float(i * j) for j in range(size)] for i in range(size)])
+    path = tempfile.mkdtemp()
+    filename = os.path.join(path, 'table.csv')
+
+    def write(**kwargs):
+        with open(filename, 'w') as f:
+            table.write_csv(f, **kwargs)
+
+    def to_csv():
+        with open(filename, 'w') as f:
+            f.write(table.to_csv())
+
+    try:
+        for name, run in (('to_csv', to_csv),
+                          ('write_csv', write),
+                          ('write_csv {:.6f}', lambda: write(float_format='{:.6f}')),
+                          ('write_csv quoting', lambda: write(quoting=True))):
+            print('  {:<24}  {:8.3f}s'.format(name, timeit(run, number=1)))
+    finally:
+        shutil.rmtree(path)
+
+
+def bench_pretty_string(rows=1000, cols=200):
+    """times Table.pretty_string of a wide table in full and with elided rows and columns"""
+    print('Table.pretty_string, {} x {} cells'.format(rows, cols))
+    table = Table.from_array([[float(i * j) for j in range(cols)] for i in range(rows)])
+    for name, run in (('full', table.pretty_string),
+                      ('20 rows, 10 columns', lambda: table.pretty_string(max_rows=20, max_cols=10))):
+        print('  {:<24}  {:8.3f}s'.format(name, timeit(run, number=1)))
+
+
+def bench_query(size=1000000):
+    """compares DictTree.query to a scan of all entries on a synthetic record of `size` keys"""
+    print('DictTree.query, {} keys'.format(size))
+    tree = synthetic_tree(size)
+    for pattern in (('book0', 'trade12', '*', '*'), ('*', '*', 'leg3', 'cf7')):
+        def scan():
+            return dict((k, v) for k, v in tree.items()
+                        if len(k) == len(pattern) and all(p == '*' or p == q for p, q in zip(pattern, k)))
+
+        print('  {}'.format(pattern))
+        print('    {:<20}  {:8.3f}s'.format('scan', timeit(scan, number=1)))
+        print('    {:<20}  {:8.3f}s'.format('first query', timeit(lambda: tree.query(pattern), number=1)))
+        print('    {:<20}  {:8.3f}s'.format('query', timeit(lambda: tree.query(pattern), number=1)))
+
+
+def bench_live_tree(size=1000000, step=1000):
+    """compares a copy of the entries into a DictTree to Record().tree after recording `step` more of `size` values"""
+    print('tree of a record of {} values, after {} more'.format(size, step))
+    Record().clear()
+    with Record() as rec:
+        rec.record_batch(synthetic_tree(size))
+        tree = rec.tree
+        print('  {:<20}  {:8.3f}s'.format('first tree', timeit(tree._prefix_node, number=1)))
+        rec.record_batch(('more%d' % i, float(i)) for i in range(step))
+        print('  {:<20}  {:8.3f}s'.format('copy to DictTree', timeit(lambda: DictTree(rec.entries), number=1)))
+        print('  {:<20}  {:8.3f}s'.format('tree', timeit(tree._prefix_node, number=1)))
+    Record().clear()
+
+
+
+def bench_storage_memory(size=200000):
+    """compares the memory and the time of a dict and of ColumnarEntries keeping `size` float entries, recorded under
+    prefixes or added with keys which exist already"""
+    if tracemalloc is None:
+        print('storage memory needs tracemalloc (Python 3)')
+        return
+    print('storage of {} floats'.format(size))
+    keys = [Record.Key(key) for key in synthetic_tree(size)]
+
+    def recorded():
+        Record().clear()
+        Record().set_storage(storage)
+        with Record():
+            for i in range(size):
+                with Record().append_prefix('trade%d' % (i // 10)):
+                    Record({'v%d' % (i % 10): float(i)})
+        return Record().entries
+
+    def existing():
+        entries = storage()
+        for i, key in enumerate(keys):
+            entries[key] = float(i)
+        return entries
+
+    for storage in (dict, ColumnarEntries):
+        for name, fill in (('recorded', recorded), ('existing keys', existing)):
+            seconds = timeit(fill, number=1)
+            tracemalloc.start()
+            entries = fill()
+            megabytes = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+            del entries
+            print('  {:<16}  {:<14}  {:8.1f}MB  {:8.3f}s'.format(storage.__name__, name, megabytes, seconds))
+    Record().clear()
+    Record().set_storage(dict)
+
+if __name__ == "__main__":
+    start_time = datetime.now()
+
+    print('')
+    print('======================================================================')
+    print('')
+    print(('run %s' % __file__))
+    print(('in %s' % os.getcwd()))
+    print(('started  at %s' % str(start_time)))
+    print('')
+    print('----------------------------------------------------------------------')
+    print('')
+
+    bench_prefix_overhead()
+    bench_to_tables()
+    bench_nested_scopes()
+    bench_recording()
+    bench_csv_export()
+    bench_table()
+    bench_column_table()
+    bench_write_csv()
+    bench_pretty_string()
+    bench_query()
+    bench_live_tree()
+    bench_storage_memory()
+
+    print('')
+    print('======================================================================')
+    print('')
+    print(('ran %s' % __file__))
+    print(('in %s' % os.getcwd()))
+    print(('started  at %s' % str(start_time)))
+    print(('finished at %s' % str(datetime.now())))
+    print('')
+    print('----------------------------------------------------------------------')
+    print('')
@@ -11,14 +11,45 @@
 
 
 from datetime import datetime
+import json
+from array import array
+import functools
+import pickle
+import random
+import shutil
+import tempfile
+from six import StringIO
+import threading
+import time
 import unittest
 import os
 import sys
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 sys.path.append('.')
 sys.path.append('..')
 
-from mitschreiben import Record
+from mitschreiben import Record, RecordedCall, DictTree, Table
+from mitschreiben.formatting import DictTreeView, RecordTree
+from mitschreiben.table import TableView, ColumnTable
+from mitschreiben.sinks import JSONLinesSink, CSVSink
+from mitschreiben.storage import ColumnarEntries, AggregatedEntries, RunningStatistics, HistoryEntries
+from mitschreiben.archive import RecordArchive
+from mitschreiben.policies import EveryNth, FirstK, LastK, Reservoir, RateLimit
+from mitschreiben.arrays import RecordedArray
+
+if sys.version_info >= (3, 7):
+    # async def is a syntax error before Python 3.5 and asyncio.run needs Python 3.7
+    from asynctests import TaskRecordTest
 
 
 # dummy functions and classes to test Record and Prefix
@@ -48,6 +79,11 @@ class Foo():
         return "Foo({})".format(self.name)
 
 
+def value_foo(name):
+    foo = Foo(name)
+    return foo.bar('baz', 'barz')
+
+
 def do_stuff():
     with Record() as rec:
         foo = Foo("Rom")
@@ -113,6 +149,67 @@ class PrefixTest(unittest.TestCase):
         self.assertEqual(Record().entries, assumed_record_entries)
 
 
+class FastPathTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+        Record.Prefix.fast_path(True)
+
+    def tearDown(self):
+        Record.Prefix.fast_path(False)
+
+    def test_bypass_without_started_record(self):
+        foo = Foo('fast')
+        self.assertTrue(Record.Prefix._bypass)
+        self.assertEqual(foo.bar('baz', 'barz'), ("That's", "great"))
+        self.assertEqual(Record()._prefix_stack, [])
+        self.assertEqual(Record().entries, dict())
+
+    def test_prefix_with_started_record(self):
+        with Record():
+            self.assertFalse(Record.Prefix._bypass)
+            Foo('fast').do_something('baz', 'barz')
+        self.assertTrue(Record.Prefix._bypass)
+
+        assumed_record_entries = {('Foo(fast).do_something', 'again_a_key'): 'baz',
+                                  ('Foo(fast).do_something', 'so_creative'): 'barz'}
+        self.assertEqual(Record().entries, assumed_record_entries)
+
+    def test_switch_off(self):
+        Record.Prefix.fast_path(False)
+        self.assertFalse(Record.Prefix._bypass)
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+        Record.Prefix.reset_profile()
+        Record.Prefix.profiling(True)
+
+    def tearDown(self):
+        Record.Prefix.profiling(False)
+        Record.Prefix.reset_profile()
+
+    def test_profile(self):
+        foo = Foo('prof')
+        foo.bar('baz', 'barz')
+        foo.bar('baz', 'barz')
+
+        table = Record.Prefix.profile_table()
+        bar, do_something = '{}.Foo.bar'.format(__name__), '{}.Foo.do_something'.format(__name__)
+        self.assertEqual(table.row_keys, [bar, do_something])
+        self.assertEqual(table.get(bar, 'calls'), 2)
+        self.assertEqual(table.get(do_something, 'calls'), 2)
+        self.assertLessEqual(table.get(bar, 'self wall'), table.get(bar, 'wall'))
+        self.assertGreaterEqual(table.get(bar, 'wall'), table.get(do_something, 'wall'))
+        self.assertAlmostEqual(table.get(do_something, 'self wall'), table.get(do_something, 'wall'))
+
+        tree = Record.Prefix.profile_tree()
+        self.assertEqual(tree['Foo(prof).bar', 'calls'], 2)
+        self.assertEqual(tree['Foo(prof).bar', 'Foo(prof).do_something', 'calls'], 2)
+        self.assertIn(('Foo(prof).bar', 'table'), tree.to_tables())
+        self.assertEqual(Record().entries, dict())
+
+
 class RecordTest(unittest.TestCase):
     """Testing Basic Functionality"""
 
@@ -172,6 +269,135 @@ class RecordTest(unittest.TestCase):
         self.assertEqual(Record().entries,
                          {('key',): 'value', ('a_key',): 'a_value', ('b_key',): 'b_value', ('INT',): 12345})
 
+    def test_live_tree(self):
+        with Record() as rec:
+            Record({'a': 1, 'b': 2})
+            with Record().append_prefix('p'):
+                with Record():
+                    Record(c=3)
+            tree = rec.tree
+            self.assertIsInstance(tree, RecordTree)
+            self.assertIs(rec._to_dict_tree(), tree)
+            self.assertEqual(dict(tree['p'].items()), {('c',): 3})
+            self.assertEqual(len(tree), 3)
+
+            rec._record(d=4)
+            rec._record(a=5)
+            with Record().append_prefix('p'):
+                rec._record(e=6)
+            # only the new keys are logged and added to the index, the entries are read from the record
+            index = tree._index
+            self.assertEqual(rec._key_log, [('d',), ('p', 'e')])
+            self.assertEqual(dict(tree['p'].items()), {('c',): 3, ('e',): 6})
+            self.assertIs(tree._index, index)
+            self.assertEqual((index.size, rec._key_log), (5, []))
+            with Record().append_prefix('p'):
+                with Record():
+                    Record(g=7)
+            self.assertEqual(tree['p', 'g'], 7)
+            self.assertIs(tree._index, index)
+            del rec.entries['p', 'g']
+            self.assertEqual(tree['a'], 5)
+            self.assertEqual(dict(tree.query(('p', '*'), lambda v: v > 3)), {('p', 'e'): 6})
+            self.assertEqual(tree.copy(), DictTree(rec.entries))
+            self.assertEqual(tree.to_tables()['table'].to_nested_list(), tree.copy().to_tables()['table'].to_nested_list())
+
+            # a removed key is noticed even if the number of entries did not change
+            del rec.entries[('d',)]
+            rec._record(f=9)
+            self.assertEqual(len(tree), 5)
+            self.assertNotIn(('d',), list(tree))
+            self.assertEqual(sorted(tree.query(('*',))), [('a',), ('b',), ('f',)])
+
+            view = tree['p']
+            rec.clear()
+            rec._record(x=7)
+            self.assertEqual(dict(tree.items()), {('x',): 7})
+            self.assertRaises(KeyError, tree.__getitem__, 'p')
+            self.assertEqual(dict(view.items()), {})
+            with Record().append_prefix('p'):
+                rec._record(z=10)
+            self.assertEqual(dict(view.items()), {('z',): 10})
+
+            rec.set_storage(ColumnarEntries)
+            rec._record(y=8)
+            self.assertEqual(sorted(tree.keys()), [('p', 'z'), ('x',), ('y',)])
+            self.assertEqual(tree['y'], 8)
+
+    def test_live_tree_threads(self):
+        with Record() as rec:
+            tree = rec.tree
+
+            def target():
+                for i in range(20000):
+                    rec._record(**{'k{}'.format(i % 7): i, 'n{}'.format(i): i})
+
+            thread = threading.Thread(target=target)
+            thread.start()
+            try:
+                # the tree takes snapshots of the keys, which must not fail while the other thread records
+                while thread.is_alive():
+                    tree.to_tables()
+                    list(tree.items())
+            finally:
+                thread.join()
+            self.assertEqual(len(list(tree)), 20007)
+            self.assertEqual(len(tree.query(('*',))), 20007)
+            self.assertEqual(tree['k0'], 19999)
+
+    def test_record_batch(self):
+        Record().record_batch({'a_key': 1})
+        self.assertEqual(Record().entries, dict())
+
+        with Record() as rec:
+            with Record().append_prefix('level2'):
+                Record().record_batch({'a_key': 1, ('b', 'c'): 2})
+                Record().record_batch(zip(['x', 'y'], [3, 4]), prefix='values')
+                Record().record_batch([(['z'], 5)], prefix=('more', 'values'))
+                self.assertEqual(Record()._prefix_stack, ['level2'])
+
+        assumed_record_entries = {('level2', 'a_key'): 1,
+                                  ('level2', 'b', 'c'): 2,
+                                  ('level2', 'values', 'x'): 3,
+                                  ('level2', 'values', 'y'): 4,
+                                  ('level2', 'more', 'values', 'z'): 5}
+        self.assertEqual(rec.entries, assumed_record_entries)
+        self.assertTrue(all(isinstance(key, Record.Key) for key in rec.entries))
+
+    def test_merge_order(self):
+        with Record() as R1:
+            Record(key='R1 before')
+            with Record() as R2:
+                Record(key='R2', other='R2')
+                with Record().append_prefix('level3'):
+                    with Record():
+                        Record(key='R3')
+            self.assertEqual(R1.entries, {('key',): 'R2', ('other',): 'R2', ('level3', 'key'): 'R3'})
+            R1._record(key='R1 after')
+            with Record():
+                Record(other='R2b')
+            R2._record(key='R2 after exit')
+            R2.clear()
+
+        assumed_record_entries = {('key',): 'R1 after', ('other',): 'R2b', ('level3', 'key'): 'R3'}
+        self.assertEqual(R1.entries, assumed_record_entries)
+        self.assertEqual(R2.entries, dict())
+
+    def test_shared_entries(self):
+        with Record() as outer:
+            with Record() as inner:
+                Record(a=1, b=2)
+            # the entries of the inner scope are attached to the outer record, but not handed out by the inner one
+            inner.entries.clear()
+            self.assertEqual(outer.entries, {('a',): 1, ('b',): 2})
+            with Record() as inner:
+                Record(a=1, b=2)
+            del inner.entries[('a',)]
+            inner.entries[('c',)] = 3
+            inner._record(b=4)
+        self.assertEqual(outer.entries, {('a',): 1, ('b',): 2})
+        self.assertEqual(inner.entries, {('b',): 4, ('c',): 3})
+
     def test_multilevel_record_context(self):
         R1 = Record()
         R2 = Record()
@@ -186,6 +412,825 @@ class RecordTest(unittest.TestCase):
             self.assertNotEqual(R2a, R2b)
 
 
+class ConcurrentRecordTest(unittest.TestCase):
+    """Testing scopes of concurrent threads and tasks"""
+
+    def setUp(self):
+        Record().clear()
+
+    @staticmethod
+    def record_values(name, results):
+        with Record() as rec:
+            with Record().append_prefix(name):
+                for i in range(50):
+                    Record({'v%d' % i: name}, level=Record._record_level)
+                    time.sleep(0)
+            results[name] = dict(rec.entries), Record()._prefix_stack
+
+    def test_threads(self):
+        results = dict()
+        threads = [threading.Thread(target=self.record_values, args=('thread%d' % n, results)) for n in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name, (entries, prefix_stack) in results.items():
+            self.assertEqual(len(entries), 51)
+            self.assertEqual(set(key[0] for key in entries), {name})
+            self.assertEqual(entries[name, 'level'], 1)
+            self.assertEqual(prefix_stack, [])
+        self.assertEqual(len(Record().entries), 20 * 51)
+        self.assertEqual(Record._record_level, 0)
+
+    @unittest.skipIf(contextvars is None, "requires contextvars")
+    def test_shared_scope(self):
+        def work(n):
+            with Record().append_prefix('worker%d' % n):
+                time.sleep(0)
+                Record(value=n)
+
+        with Record() as rec:
+            threads = [threading.Thread(target=contextvars.copy_context().run, args=(work, n)) for n in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(Record()._prefix_stack, [])
+
+        self.assertEqual(rec.entries, dict((('worker%d' % n, 'value'), n) for n in range(20)))
+
+
+class SerializeTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+
+    def test_serialize_and_merge(self):
+        with Record() as rec:
+            Record(a_key=1.5, another_key=(1, 2))
+            with Record().append_prefix('level2'):
+                Record(a_key='2')
+            data = rec.serialize()
+
+        with Record() as rec:
+            with Record().append_prefix('outer'):
+                rec.merge(data, prefix='worker')
+            rec.merge(data, prefix=('worker', 'again'))
+
+        assumed_record_entries = {('outer', 'worker', 'a_key'): 1.5,
+                                  ('outer', 'worker', 'another_key'): (1, 2),
+                                  ('outer', 'worker', 'level2', 'a_key'): '2',
+                                  ('worker', 'again', 'a_key'): 1.5,
+                                  ('worker', 'again', 'another_key'): (1, 2),
+                                  ('worker', 'again', 'level2', 'a_key'): '2'}
+        self.assertEqual(rec.entries, assumed_record_entries)
+
+    def test_recorded_call(self):
+        Record().clear()
+        call = pickle.loads(pickle.dumps(RecordedCall(value_foo)))
+        value, data = call('worker')
+        self.assertEqual(value, ("That's", "great"))
+        self.assertEqual(Record().entries, dict())
+
+        with Record() as rec:
+            rec.merge(data, 'trade')
+        self.assertEqual(len(rec.entries), 4)
+        self.assertEqual(rec.entries['trade', 'Foo(worker).bar', 'a_key'], "That's")
+        self.assertIsInstance(list(rec.entries.keys())[0], Record.Key)
+
+
+class SinkTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+
+    def test_json_lines_sink(self):
+        stream = StringIO()
+        sink = JSONLinesSink(stream, buffer_size=2)
+        with Record() as rec:
+            rec.add_sink(sink, retain=False)
+            Record(a_key=1.5)
+            self.assertEqual(stream.getvalue(), '')
+            with Record().append_prefix('level2'):
+                Record(b_key='b')
+            self.assertEqual(len(stream.getvalue().splitlines()), 2)
+            with Record() as inner:
+                Record(c_key=None)
+            self.assertEqual(inner.entries, dict())
+            rec.remove_sink(sink)
+            self.assertEqual(rec.entries, dict())
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(lines, [{'key': ['a_key'], 'value': 1.5},
+                                 {'key': ['level2', 'b_key'], 'value': 'b'},
+                                 {'key': ['c_key'], 'value': None}])
+
+    def test_csv_sink(self):
+        stream = StringIO()
+        with CSVSink(stream) as sink:
+            with Record() as rec:
+                rec.add_sink(sink)
+                with Record().append_prefix('level2'):
+                    Record(a_key='a;b')
+        self.assertEqual(stream.getvalue(), 'level2|a_key;"a;b"\n')
+        self.assertEqual(rec.entries, {('level2', 'a_key'): 'a;b'})
+
+    def test_file_sink(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'record.csv')
+            with CSVSink(filename) as sink:
+                with Record() as rec:
+                    rec.add_sink(sink, retain=False)
+                    Record(a_key=1)
+            with open(filename) as f:
+                self.assertEqual(f.read(), 'a_key;1\n')
+        finally:
+            shutil.rmtree(path)
+
+    def test_inner_scopes(self):
+        kept, dropped = StringIO(), StringIO()
+        with JSONLinesSink(kept) as keeping, JSONLinesSink(dropped) as dropping:
+            with Record() as rec:
+                rec.add_sink(dropping, retain=False)
+                with Record().append_prefix('outer'):
+                    with Record() as inner:
+                        with Record().append_prefix('inner'):
+                            Record(a_key=1)
+                    self.assertEqual(inner.entries, dict())
+                rec.add_sink(keeping)
+                with Record().append_prefix('outer'):
+                    with Record() as inner:
+                        Record(b_key=2)
+                    self.assertEqual(inner.entries, {('b_key',): 2})
+        self.assertEqual(rec.entries, {('outer', 'b_key'): 2})
+        self.assertEqual([json.loads(line)['key'] for line in dropped.getvalue().splitlines()],
+                         [['outer', 'inner', 'a_key'], ['outer', 'b_key']])
+        self.assertEqual([json.loads(line)['key'] for line in kept.getvalue().splitlines()], [['outer', 'b_key']])
+
+
+class ColumnarEntriesTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+
+    def test_mapping(self):
+        entries = ColumnarEntries({('a', 'b'): 1.5, ('a', 'c'): 2})
+        entries['a', 'd'] = 'text'
+        entries['a', 'b'] = 2.5
+        entries['a', 'c'] = None
+        self.assertEqual(dict(entries.items()), {('a', 'b'): 2.5, ('a', 'c'): None, ('a', 'd'): 'text'})
+        self.assertEqual(len(entries), 3)
+        self.assertIn(('a', 'd'), entries)
+        self.assertNotIn(('x',), entries)
+        self.assertRaises(KeyError, entries.__getitem__, ('a', 'x'))
+        self.assertRaises(TypeError, entries.__setitem__, 'a', 1)
+        del entries['a', 'd']
+        self.assertEqual(sorted(entries.keys()), [('a', 'b'), ('a', 'c')])
+        self.assertEqual(list(entries.floats), [2.5])
+        self.assertEqual(list(entries.ints), [2])
+
+        entries['a', 'd'] = 1.0
+        self.assertEqual(list(entries), [('a', 'b'), ('a', 'c'), ('a', 'd')])
+        keys = [('k%d' % (i % 7), 'v%d' % i) for i in range(1000)]
+        entries.update((key, i) for i, key in enumerate(keys))
+        del entries['k0', 'v0']
+        self.assertEqual(len(entries), 1002)
+        self.assertNotIn(('k0', 'v0'), entries)
+        self.assertEqual([entries[key] for key in keys[1:]], list(range(1, 1000)))
+        self.assertEqual(list(entries)[3:], keys[1:])
+
+    def test_record_storage(self):
+        with Record() as rec:
+            Record(a_key='a')
+            rec.set_storage(ColumnarEntries)
+            with Record().append_prefix('level2'):
+                Record(a_key=1.0, another_key=1)
+                with Record() as inner:
+                    self.assertIsInstance(inner.entries, ColumnarEntries)
+                    Record(inner_key=2.0)
+        self.assertIsInstance(rec.entries, ColumnarEntries)
+        assumed_record_entries = {('a_key',): 'a',
+                                  ('level2', 'a_key'): 1.0,
+                                  ('level2', 'another_key'): 1,
+                                  ('level2', 'inner_key'): 2.0}
+        self.assertEqual(dict(rec.entries), assumed_record_entries)
+        self.assertIsInstance(list(rec.entries)[0], Record.Key)
+        self.assertEqual(rec._to_dict_tree()['level2', 'inner_key'], 2.0)
+
+
+class AggregatedEntriesTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+        self.values = [random.Random(i).gauss(100., 10.) for i in range(2000)]
+        self.mean = sum(self.values) / len(self.values)
+        self.std = (sum((v - self.mean) ** 2 for v in self.values) / (len(self.values) - 1)) ** .5
+
+    def test_statistics(self):
+        stats = RunningStatistics(quantiles=(.5, .9))
+        for value in self.values:
+            stats.add(value)
+        self.assertEqual(stats.count, 2000)
+        self.assertAlmostEqual(stats.mean, self.mean)
+        self.assertAlmostEqual(stats.std, self.std)
+        self.assertEqual(stats.min, min(self.values))
+        self.assertEqual(stats.max, max(self.values))
+        for q in (.5, .9):
+            exact = sorted(self.values)[int(q * 1999)]
+            self.assertLess(abs(stats.quantile(q) / exact - 1.), .011)
+
+        other = RunningStatistics()
+        for value in self.values[:500]:
+            other.add(value)
+        merged = RunningStatistics()
+        for value in self.values[500:]:
+            merged.add(value)
+        merged.merge(other)
+        self.assertAlmostEqual(merged.mean, stats.mean)
+        self.assertAlmostEqual(merged.variance, stats.variance)
+
+    def test_record(self):
+        with Record() as rec:
+            rec.set_storage(functools.partial(AggregatedEntries, quantiles=(.5,)))
+            with Record().append_prefix('trade'):
+                for value in self.values[:1000]:
+                    Record(price=value, name='trade')
+                for value in self.values[1000:]:
+                    with Record():
+                        Record(price=value)
+
+        price = rec.entries['trade', 'price']
+        self.assertEqual(price.count, 2000)
+        self.assertAlmostEqual(price.mean, self.mean)
+        self.assertEqual(rec.entries['trade', 'name'], 'trade')
+
+        table = rec._to_dict_tree().to_tables()['table', ]
+        self.assertEqual(table.get('price', 'trade'), price)
+        self.assertIn('n=2000', table.pretty_string())
+
+        tables = rec.entries.to_dict_tree().to_tables()
+        self.assertEqual(tables['trade', 'table'].get('count', 'price'), 2000)
+        self.assertAlmostEqual(tables['trade', 'table'].get('q0.5', 'price'), price.quantile(.5))
+
+
+class HistoryEntriesTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def record(self):
+        with Record() as rec:
+            rec.set_storage(functools.partial(HistoryEntries, timestamps=True))
+            with Record().append_prefix('solver'):
+                for i in range(5):
+                    Record(error=1. / (i + 1), iteration=i)
+                with Record():
+                    Record(error=0., state='done')
+        return rec
+
+    def test_series(self):
+        rec = self.record()
+        error = rec.entries['solver', 'error']
+        self.assertEqual(list(rec.entries.series(('solver', 'error'))), [1., .5, 1. / 3, .25, .2, 0.])
+        self.assertEqual(error.values.typecode, 'd')
+        self.assertIn(rec.entries.series(('solver', 'iteration')).typecode, ('q', 'l'))
+        self.assertEqual(rec.entries.series(('solver', 'state')), ['done'])
+        self.assertEqual(list(error.sequence), sorted(error.sequence))
+        self.assertEqual(len(error.times), 6)
+        self.assertIn('(n=6)', str(error))
+
+        # values of another type turn the array into a list
+        rec.entries['solver', 'error'] = 1
+        rec.entries['solver', 'iteration'] = 5.
+        rec.entries['solver', 'iteration'] = True
+        self.assertEqual(rec.entries.series(('solver', 'error'))[-2:], [0., 1])
+        self.assertIs(type(rec.entries.series(('solver', 'error'))[-1]), int)
+        self.assertEqual(rec.entries.series(('solver', 'iteration')), [0, 1, 2, 3, 4, 5., True])
+        self.assertIs(rec.entries['solver', 'iteration'][-1], True)
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_to_files(self):
+        rec = self.record()
+        self.assertEqual(list(rec.entries['solver', 'iteration'].to_numpy()), [0, 1, 2, 3, 4])
+        rec.entries.to_files(self.path)
+        with open(os.path.join(self.path, 'index.json')) as f:
+            index = dict((tuple(item['key']), item['files']) for item in json.load(f))
+        files = index['solver', 'error']
+        values = numpy.load(os.path.join(self.path, files['values']))
+        self.assertEqual(list(values), list(rec.entries.series(('solver', 'error'))))
+        sequence = numpy.load(os.path.join(self.path, files['sequence']))
+        self.assertEqual(list(sequence), list(rec.entries['solver', 'error'].sequence))
+        self.assertTrue(index['solver', 'state']['values'].endswith('.json'))
+
+
+class RecordArchiveTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_write_and_read(self):
+        with Record() as rec:
+            for i in range(100):
+                with Record().append_prefix('trade%02d' % i):
+                    Record(price=i * 0.5, count=i, name='trade', flows=[1, 2, 3])
+            Record(big=2 ** 70)
+        rec.to_archive('record.bin', self.path)
+
+        with RecordArchive(os.path.join(self.path, 'record.bin')) as archive:
+            self.assertEqual(len(archive), 401)
+            self.assertEqual(archive['trade07', 'price'], 3.5)
+            self.assertEqual(archive['trade07', 'count'], 7)
+            self.assertEqual(archive['trade07', 'flows'], [1, 2, 3])
+            self.assertEqual(archive['big'], 2 ** 70)
+            tree = archive['trade42']
+            self.assertIsInstance(tree, DictTree)
+            self.assertEqual(dict(tree), {('price',): 21., ('count',): 42, ('name',): 'trade', ('flows',): [1, 2, 3]})
+            self.assertIn(('trade42', 'name'), archive)
+            self.assertNotIn(('trade42',), archive)
+            self.assertRaises(KeyError, archive.__getitem__, ('trade42', 'unknown'))
+            self.assertRaises(KeyError, archive.__getitem__, 'unknown')
+            self.assertEqual(archive.to_dict_tree(), rec.entries)
+
+    def test_empty(self):
+        filename = os.path.join(self.path, 'empty.bin')
+        DictTree().to_archive(filename)
+        with RecordArchive(filename) as archive:
+            self.assertEqual(len(archive), 0)
+            self.assertRaises(KeyError, archive.__getitem__, 'a')
+
+
+class RecordArrayTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+
+    def test_record_array(self):
+        flows = array('d', [1., 2., 3.])
+        Record().record_array('flows', flows)
+        self.assertEqual(Record().entries, dict())
+
+        with Record() as rec:
+            with Record().append_prefix('trade'):
+                Record().record_array('flows', flows, labels=['2020', '2021', '2022'])
+                Record().record_array('dates', ['2020', '2021', '2022'], labels=['2020', '2021', '2022'])
+                Record(notional=100.)
+
+        value = rec.entries['trade', 'flows']
+        self.assertIsInstance(value, RecordedArray)
+        self.assertIs(value.values, flows)
+
+        tables = rec._to_dict_tree().to_tables()
+        table = tables['trade', 'arrays']
+        self.assertEqual(table.name, 'trade---arrays')
+        self.assertEqual(table.col_keys, ['dates', 'flows'])
+        self.assertEqual(table.row_keys, ['2020', '2021', '2022'])
+        self.assertEqual(table.get('2021', 'flows'), 2.)
+        self.assertEqual(tables['table', ].get('notional', 'trade'), 100.)
+        self.assertEqual(table.to_csv().splitlines()[1], '2020;2020;1.0')
+
+    @unittest.skipIf(numpy is None, "requires numpy")
+    def test_numpy_array(self):
+        flows = numpy.arange(5.)
+        stream = StringIO()
+        with JSONLinesSink(stream) as sink:
+            with Record() as rec:
+                rec.add_sink(sink)
+                Record().record_array('flows', flows)
+        self.assertIs(rec.entries['flows', ].values, flows)
+        self.assertEqual(json.loads(stream.getvalue())['value'], [0., 1., 2., 3., 4.])
+        table = rec._to_dict_tree().to_tables()['arrays', ]
+        self.assertEqual(table.row_keys, [0, 1, 2, 3, 4])
+        self.assertIsInstance(table.get(4, 'flows'), float)
+
+
+class PolicyTest(unittest.TestCase):
+    def setUp(self):
+        Record().clear()
+
+    def record_with(self, policy, n=10):
+        with Record() as rec:
+            rec.set_policy(policy)
+            for i in range(n):
+                Record(a_key=i)
+            for i in range(n):
+                with Record():
+                    Record(inner_key=i)
+        return rec.entries
+
+    def test_every_nth(self):
+        self.assertEqual(self.record_with(EveryNth(4)), {('a_key',): 8, ('inner_key',): 8})
+
+    def test_first_k(self):
+        self.assertEqual(self.record_with(FirstK(3)), {('a_key',): [0, 1, 2], ('inner_key',): [0, 1, 2]})
+
+    def test_last_k(self):
+        entries = self.record_with(LastK(3))
+        self.assertEqual(entries['a_key', ], [7, 8, 9])
+
+    def test_snapshots(self):
+        stream = StringIO()
+        with JSONLinesSink(stream, buffer_size=10) as sink:
+            with Record() as rec:
+                rec.set_policy(LastK(2))
+                rec.add_sink(sink)
+                for i in range(4):
+                    Record(a_key=i)
+                    if i == 1:
+                        first = rec.entries['a_key', ]
+        self.assertEqual(first, [0, 1])
+        self.assertEqual(rec.entries['a_key', ], [2, 3])
+        self.assertEqual([json.loads(line)['value'] for line in stream.getvalue().splitlines()],
+                         [[0], [0, 1], [1, 2], [2, 3]])
+
+    def test_every(self):
+        stream = StringIO()
+        with JSONLinesSink(stream, buffer_size=10) as sink:
+            with Record() as rec:
+                rec.set_policy(LastK(3, every=4))
+                rec.add_sink(sink)
+                for i in range(10):
+                    Record(a_key=i)
+                with Record():
+                    Record(b_key=0)
+                    Record(b_key=1)
+                self.assertEqual(rec.entries, {('a_key',): [6, 7, 8], ('b_key',): [0]})
+        # a snapshot is written on every 4th change of a key, the last changes when the scope is left
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([line['value'] for line in lines[:4]], [[0], [2, 3, 4], [6, 7, 8], [0]])
+        self.assertEqual(sorted((line['key'], line['value']) for line in lines[4:]), [(['a_key'], [7, 8, 9]),
+                                                                                      (['b_key'], [0, 1])])
+        self.assertEqual(rec.entries, {('a_key',): [7, 8, 9], ('b_key',): [0, 1]})
+
+        with Record() as rec:
+            rec.set_policy(FirstK(5, every=10))
+            with Record().append_prefix('outer'):
+                for i in range(3):
+                    Record(a_key=i)
+            self.assertEqual(rec.entries, {('outer', 'a_key'): [0]})
+            rec.set_policy()
+            self.assertEqual(rec.entries, {('outer', 'a_key'): [0, 1, 2]})
+
+    def test_inner_scopes(self):
+        with Record() as rec:
+            rec.set_policy(FirstK(2))
+            with Record().append_prefix('outer'):
+                for i in range(3):
+                    with Record() as inner:
+                        for j in range(5):
+                            Record(a_key=j)
+                        self.assertEqual(inner.entries, {('a_key',): [0, 1]} if i == 0 else dict())
+        self.assertEqual(rec.entries, {('outer', 'a_key'): [0, 1]})
+
+    def test_reservoir(self):
+        entries = self.record_with(Reservoir(3, seed=1), n=1000)
+        self.assertEqual(len(entries['a_key', ]), 3)
+        self.assertEqual(len(set(entries['a_key', ])), 3)
+
+    def test_rate_limit(self):
+        clock = functools.partial(next, iter([0., .5, 1., 1.5, 2., 2.5]))
+        with Record() as rec:
+            rec.set_policy(RateLimit(1., clock=clock))
+            for i in range(6):
+                Record(a_key=i)
+                if i == 2:
+                    self.assertEqual(rec.entries, {('a_key',): 2})
+        self.assertEqual(rec.entries, {('a_key',): 4})
+
+    def test_batch(self):
+        with Record() as rec:
+            rec.set_policy(EveryNth(2))
+            Record().record_batch([('a_key', 1), ('a_key', 2), ('a_key', 3), ('b_key', 4)])
+            rec.set_policy()
+            Record(c_key=5)
+        self.assertEqual(rec.entries, {('a_key',): 3, ('b_key',): 4, ('c_key',): 5})
+
+
+class DictTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.tree = DictTree({('a', 'b', 'c'): 1, ('a', 'b', 'd'): 2, ('a', 'e'): 3, ('f',): 4})
+
+    def test_exact_lookup(self):
+        self.assertEqual(self.tree['a', 'b', 'c'], 1)
+        self.assertEqual(self.tree['f'], 4)
+        self.assertRaises(KeyError, self.tree.__getitem__, ('a', 'x'))
+
+    def test_partial_lookup(self):
+        view = self.tree['a']
+        self.assertIsInstance(view, DictTreeView)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(dict(view.items()), {('b', 'c'): 1, ('b', 'd'): 2, ('e',): 3})
+        self.assertEqual(view['b', 'd'], 2)
+        self.assertEqual(dict(view['b'].items()), {('c',): 1, ('d',): 2})
+        self.assertIn(('e',), view)
+        self.assertNotIn(('b',), view)
+
+    def test_view_shares_storage(self):
+        view = self.tree['a', 'b']
+        self.tree['a', 'b', 'x'] = 5
+        self.assertEqual(view['x'], 5)
+        del self.tree['a', 'b', 'c']
+        self.assertEqual(sorted(view.keys()), [('d',), ('x',)])
+        self.tree.pop(('a', 'b', 'd'))
+        self.tree.pop(('a', 'b', 'x'))
+        self.assertEqual(len(view), 0)
+        self.assertRaises(KeyError, self.tree.__getitem__, ('a', 'b'))
+
+        # the view follows its prefix when the subtree is emptied and filled again or the tree is cleared
+        self.tree['a', 'b', 'y'] = 6
+        self.assertEqual(dict(view.items()), {('y',): 6})
+        self.tree.clear()
+        self.assertEqual(len(view), 0)
+        self.assertEqual(list(view.keys()), [])
+        self.tree |= {('a', 'b', 'z'): 7}
+        self.assertEqual(dict(view.items()), {('z',): 7})
+        self.assertEqual(dict(self.tree['a'].items()), {('b', 'z'): 7})
+
+    def test_mutation_keeps_index(self):
+        self.tree.update({('g', 'h'): 6})
+        self.tree.setdefault(('g', 'i'), 7)
+        self.assertEqual(dict(self.tree['g'].items()), {('h',): 6, ('i',): 7})
+        copy = self.tree['g'].copy()
+        self.assertIsInstance(copy, DictTree)
+        self.assertEqual(copy['h'], 6)
+        self.tree.clear()
+        self.assertRaises(KeyError, self.tree.__getitem__, 'g')
+
+    def test_to_tables(self):
+        tables = self.tree.to_tables()
+        self.assertEqual(sorted(tables.keys()), [('a', 'table'), ('table',)])
+        self.assertEqual(tables['a', 'table'].name, 'a')
+        self.assertEqual(tables['a', 'table'].get('c', 'b'), 1)
+        self.assertEqual(tables['a', 'table'].get('d', 'b'), 2)
+        self.assertEqual(tables['table'].get('e', 'a'), 3)
+
+        self.tree[('a',)] = 0
+        self.assertEqual(list(self.tree.to_tables().keys()), [('table',)])
+        self.assertEqual(dict(DictTree().to_tables()), dict())
+
+        # a root key skips the tables of the root level only
+        tree = DictTree({(): 1, ('x',): 4, ('a', 'b', 'c'): 2, ('a', 'b', 'd'): 3})
+        tables = tree.to_tables()
+        self.assertEqual(list(tables.keys()), [('a', 'table')])
+        self.assertEqual(tables['a', 'table'].row_keys, ['c', 'd'])
+        self.assertEqual(tables['a', 'table'].get_column('b'), {'c': 2, 'd': 3})
+
+    def test_query(self):
+        tree = DictTree(((book, trade, field), float(i))
+                        for i, (book, trade, field) in enumerate((b, t, f) for b in 'xy' for t in 'abc' for f in ('price', 'delta')))
+        tree['x', 'price'] = -1.
+
+        found = tree.query(('*', '*', 'price'))
+        self.assertIsInstance(found, DictTree)
+        self.assertEqual(sorted(found.keys()), [(b, t, 'price') for b in 'xy' for t in 'abc'])
+        self.assertEqual(sorted(tree.query(('y', '*', '*')).keys()), sorted(k for k in tree if k[0] == 'y' and len(k) == 3))
+        self.assertEqual(list(tree.query(('x', 'price')).values()), [-1.])
+        self.assertEqual(sorted(tree.query(('*', 'b', '*'), lambda v: v > 6.).values()), [8., 9.])
+        self.assertEqual(len(tree.query(('*', '*'))), 1)
+        self.assertEqual(len(tree.query(('z', '*', '*'))), 0)
+
+        # the index of key parts is kept up to date
+        tree['z', 'a', 'price'] = 12.
+        del tree['x', 'a', 'price']
+        self.assertEqual(sorted(tree.query(('*', 'a', 'price')).keys()), [('y', 'a', 'price'), ('z', 'a', 'price')])
+        self.assertEqual(dict(tree['y'].query(('*', 'price'), lambda v: v < 8.)), {('a', 'price'): 6.})
+
+        table = tree.query_table(('*', '*', 'price'), name='price')
+        self.assertEqual(table.row_keys, ['x', 'y', 'z'])
+        self.assertEqual(table.col_keys, ['b', 'c', 'a'])
+        self.assertEqual(table.get('y', 'c'), 10.)
+        table = tree['x'].query_table(('*', 'delta'))
+        self.assertEqual(table.get_column('delta'), {'a': 1., 'b': 3., 'c': 5.})
+
+    def test_html_to_stream(self):
+        cwd = os.getcwd()
+        path = tempfile.mkdtemp()
+        try:
+            os.chdir(path)
+            for writer in (self.tree.as_tree_to_html, self.tree.as_tables_to_html, self.tree.as_html_tree_table):
+                stream = StringIO()
+                writer(stream, title='tree')
+                html = stream.getvalue()
+                self.assertIn('<title>tree</title>', html)
+                writer('tree.html', title='tree')
+                with open('tree.html') as f:
+                    self.assertEqual(f.read(), html)
+            # no temporary files are left behind
+            self.assertEqual(os.listdir(path), ['tree.html'])
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(path)
+
+    def test_csv_files(self):
+        tree = DictTree((('x' * 250 + str(i), str(j), 'c'), i * j) for i in range(4) for j in range(3))
+        for workers, processes in ((None, False), (4, False), (2, True)):
+            path = tempfile.mkdtemp()
+            try:
+                calls = list()
+                report = tree.to_csv_files(path, workers, processes, lambda *args: calls.append(args))
+                files = sorted(os.listdir(path))
+                self.assertEqual(len(files), 4)
+                # long table names are shortened to their first and last 100 characters
+                self.assertEqual(len(files[0]), len('20190918_') + 203 + len('.csv'))
+                self.assertTrue(files[0].endswith('x' * 99 + '0.csv'))
+                self.assertEqual(sorted(c[0] for c in calls), [1, 2, 3, 4])
+                self.assertEqual(report.rows_count, 4)
+                self.assertEqual(report.get(os.path.join(path, files[0]), 'rows'), 3)
+                with open(os.path.join(path, files[1])) as f:
+                    self.assertEqual(f.read(), ';c\n0;0\n1;1\n2;2')
+            finally:
+                shutil.rmtree(path)
+
+    def test_lazy_html_report(self):
+        tree = DictTree(((str(i), str(j)), i * j) for i in range(5) for j in range(3))
+        path = tempfile.mkdtemp()
+        try:
+            tree.as_lazy_html_report('report.html', path, tables=False, page_size=2)
+            with open(os.path.join(path, 'report.html')) as f:
+                html = f.read()
+            self.assertIn("<div class='panel' data-chunk='1'></div>", html)
+            self.assertIn("<button class='more' data-chunk='3'>... 3 more</button>", html)
+            self.assertNotIn("4 : 8", html)
+            chunks = sorted(os.listdir(os.path.join(path, 'report_chunks')))
+            # 5 subtrees with 3 values each on 2 pages, 2 more pages of the top level
+            self.assertEqual(len(chunks), 5 * 2 + 2)
+        finally:
+            shutil.rmtree(path)
+
+        stream = StringIO()
+        self.tree.as_lazy_html_report(stream)
+        self.assertIn("<div class='panel' data-chunk='1'></div>", stream.getvalue())
+        self.assertIn("<script type='application/json' id='chunk-1'>", stream.getvalue())
+        self.assertIn("<th colspan='2'>table<\\/th>", stream.getvalue())
+
+        # the tables are made one by one as in to_tables
+        tree = DictTree(self.tree)
+        tree['x', 'y'] = RecordedArray([1., 2.])
+        for key, table in tree.to_tables().items():
+            self.assertEqual(tree._make_table(key).pretty_string(), table.pretty_string())
+        self.assertEqual(sorted(tree._table_index().iter_keys()), sorted(tree.to_tables().keys()))
+
+        with Record() as rec:
+            Record(tree)
+        stream = StringIO()
+        rec.to_html_report(stream, title='record', tables=False, page_size=2)
+        self.assertIn('<title>record</title>', stream.getvalue())
+        self.assertIn("<button class='more' data-chunk='", stream.getvalue())
+        self.assertIn("e : 3", stream.getvalue())
+
+        table = self.tree.to_tables()['a', 'table']
+        self.assertEqual(table.to_html(), "".join(table.iter_html()))
+        self.assertEqual(table.to_html().count("<tr class='bodyrow'>"), table.rows_count + 1)
+
+
+class TableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = Table(default_value=0, name='t')
+        self.table.append('b', 'y', 1)
+        self.table.append('a', 'x', 2)
+        self.table.append_row('c', {'z': 3, 'x': 4})
+
+    def test_keys(self):
+        self.assertEqual(self.table.row_keys, ['b', 'a', 'c'])
+        self.assertEqual(self.table.col_keys, ['y', 'x', 'z'])
+        self.assertTrue(self.table.has_row('a'))
+        self.assertTrue(self.table.has_column('z'))
+        self.assertFalse(self.table.has_column('a'))
+        self.assertEqual(self.table.get_row('a'), {'x': 2, 'y': 0, 'z': 0})
+        self.assertEqual(self.table.get_column('x'), {'a': 2, 'b': 0, 'c': 4})
+
+    def test_transpose_and_sort(self):
+        transposed = self.table.transpose()
+        self.assertEqual(transposed.row_keys, ['y', 'x', 'z'])
+        self.assertEqual(transposed.col_keys, ['b', 'a', 'c'])
+        self.assertEqual(transposed.get('x', 'c'), 4)
+        self.assertEqual(transposed.get('z', 'a'), 0)
+        self.assertEqual(transposed.transpose().to_nested_list(), self.table.to_nested_list())
+
+        ordered = self.table.sort()
+        self.assertEqual(ordered.row_keys, ['a', 'b', 'c'])
+        self.assertEqual(ordered.col_keys, ['x', 'y', 'z'])
+        self.assertEqual(ordered.name, 't')
+        ordered.append('a', 'x', 5)
+        ordered.append('d', 'w', 6)
+        self.assertEqual(self.table.get('a', 'x'), 2)
+        self.assertEqual(ordered.row_keys, ['a', 'b', 'c', 'd'])
+        self.assertEqual(ordered.col_keys, ['x', 'y', 'z', 'w'])
+
+    def test_views(self):
+        view = self.table.sort(copy=False).transpose(copy=False)
+        self.assertIsInstance(view, TableView)
+        self.assertIs(view._table, self.table)
+        self.assertEqual(view.to_nested_list(), self.table.sort().transpose().to_nested_list())
+        self.assertEqual(view.get_column('c'), {'x': 4, 'y': 0, 'z': 3})
+        self.assertEqual(view.transpose(copy=False).to_nested_list(), self.table.sort().to_nested_list())
+
+        subset = self.table.select(['x', 'z'])
+        self.assertEqual(subset.col_keys, ['x', 'z'])
+        self.assertEqual(subset.get('b', 'y'), 0)
+        self.assertEqual(subset.copy().get_row('c'), {'x': 4, 'z': 3})
+
+        # cells outside of the view are not seen
+        self.assertEqual(subset.get_row_list('c', ['y', 'z']), [0, 3])
+        self.assertEqual(subset.get_column('y'), {'c': 0, 'a': 0, 'b': 0})
+        self.assertEqual(subset.get_row_list('d', ['x']), [0])
+        self.assertEqual(subset.transpose(copy=False).get_row_list('z', ['c', 'd']), [3, 0])
+        self.assertEqual(self.table.select(['x'], ['a', 'b']).transpose(copy=False).get_row_list('x', ['c', 'b']),
+                         [0, self.table.get('b', 'x')])
+
+        # a view on a view does not show the cells the other view hides
+        subset = self.table.select(['x'])
+        self.assertEqual(subset.select(['x', 'z']).get('c', 'z'), 0)
+        self.assertEqual(subset.select(['x', 'z']).get_column('z'), {'b': 0, 'a': 0, 'c': 0})
+        self.assertIs(subset.select(['x'], ['c']).transpose(copy=False)._table, self.table)
+        subset = self.table.select(['x', 'z'], ['c']).sort(copy=False).select(row_keys=['a', 'c'])
+        self.assertEqual(subset.get('a', 'x'), 0)
+        self.assertEqual(subset.transpose(copy=False).get_row_list('x', ['a', 'c']), [0, 4])
+        self.assertEqual(subset.copy().to_nested_list(), [[' ', 'x', 'z'], ['a', 0, 0], ['c', 4, 3]])
+
+        # cells are shared until the view is changed
+        self.table.append('a', 'x', 5)
+        self.assertEqual(view.get('x', 'a'), 5)
+        view.append('x', 'a', 6)
+        self.assertIsNone(view._table)
+        self.assertEqual(view.get('x', 'a'), 6)
+        self.assertEqual(view.get('z', 'c'), 3)
+        self.assertEqual(self.table.get('a', 'x'), 5)
+
+    def test_write_csv(self):
+        self.table.append('d', 'x', 0.123456789)
+        self.table.append('e;f', 'y', 'say "hi"')
+        self.assertEqual(self.table.to_csv(), ';x;y;z\nb;0;1;0\na;2;0;0\nc;4;0;3\nd;0.123456789;0;0\ne;f;0;say "hi";0')
+
+        stream = StringIO()
+        self.table.write_csv(stream, float_format='{:.3f}', rows_per_write=2)
+        self.assertEqual(stream.getvalue().split('\n')[4], 'd;0.123;0;0')
+
+        stream = StringIO()
+        self.table.write_csv(stream, float_format='%.2e', quoting=True)
+        self.assertEqual(stream.getvalue().split('\n')[4:], ['d;1.23e-01;0;0', '"e;f";0;"say ""hi""";0', ''])
+
+    def test_pretty_string(self):
+        self.assertEqual(self.table.pretty_string(leftUpper='key'),
+                         't\nkey | y | x | z\n  b | 1 | 0 | 0\n  a | 0 | 2 | 0\n  c | 0 | 4 | 3')
+        table = Table.from_array([[i * j for j in range(10)] for i in range(10)])
+        self.assertEqual(table.pretty_string(max_rows=3, max_cols=2),
+                         '    |   0 | ... |   9\n  0 |   0 | ... |   0\n  1 |   0 | ... |   9\n'
+                         '... | ... | ... | ...\n  9 |   0 | ... |  81')
+        stream = StringIO()
+        table.write_pretty(stream, max_rows=4)
+        self.assertEqual(len(stream.getvalue().split('\n')), 6)
+
+    def test_bulk_constructors(self):
+        rows = [[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]]
+        for cls in (Table, ColumnTable):
+            table = cls.from_array(rows, row_keys='abc', col_keys='xy', name='t')
+            self.assertIsInstance(table, cls)
+            self.assertEqual(table.name, 't')
+            self.assertEqual(table.to_nested_list(), [[' ', 'x', 'y'], ['a', 1.0, 2.0], ['b', 3.0, 4.0], ['c', 5.0, 6.0]])
+            self.assertEqual(cls.from_columns([('x', [1.0, 3.0, 5.0]), ('y', [2.0, 4.0, 6.0])], 'abc').to_nested_list(),
+                             table.to_nested_list())
+            cells = [(r, c, table.get(r, c)) for r in 'abc' for c in 'xy']
+            self.assertEqual(cls.from_cells(cells).to_nested_list(), table.to_nested_list())
+
+    def test_column_table(self):
+        values = array('d', [1.0, 2.0, 3.0])
+        table = ColumnTable.from_columns({'x': values, 'y': [1, 2]}, default_value=0)
+        self.assertIs(table._columns['x'], values)
+        self.assertIn(table._columns['y'].typecode, ('q', 'l'))
+        self.assertEqual(table.get_row_list(2, ['x', 'y']), [3.0, 0])
+        self.assertEqual(table.get_column('y'), {0: 1, 1: 2, 2: 0})
+
+        buffer = table.column_buffer('x')
+        if sys.version_info[0] > 2:
+            self.assertIs(buffer.obj, values)
+            self.assertEqual(table.column_buffer('y').tolist(), [1, 2, 0])
+
+        table.append(3, 'x', 'four')
+        self.assertIsInstance(table._columns['x'], list)
+        self.assertEqual(values.tolist(), [1.0, 2.0, 3.0])
+        self.assertRaises(TypeError, table.column_buffer, 'x')
+        self.assertEqual(table.rows_count, 4)
+        self.assertEqual(table.get(3, 'y'), 0)
+
+        self.assertEqual(table.sort(lambda r: -r).get_column('x'), {3: 'four', 2: 3.0, 1: 2.0, 0: 1.0})
+        self.assertEqual(table.transpose().to_nested_list(), table.transpose(copy=False).to_nested_list())
+        self.assertEqual(table.transpose().get_row('x'), {0: 1.0, 1: 2.0, 2: 3.0, 3: 'four'})
+        self.assertEqual(table.select(['y']).copy().get_column('y'), {0: 1, 1: 2, 2: 0, 3: 0})
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_column_table_numpy(self):
+        values = numpy.arange(12.0).reshape(4, 3)
+        table = ColumnTable.from_array(values)
+        self.assertTrue(numpy.shares_memory(table.to_numpy(1), values))
+        self.assertTrue(numpy.array_equal(table.to_numpy(), values))
+        table = ColumnTable.from_columns({'x': [1.0, 2.0]})
+        self.assertTrue(numpy.shares_memory(table.to_numpy('x'), table.column_buffer('x')))
+        self.assertTrue(numpy.array_equal(Table.from_array(values).to_numpy(), values))
+
+
 if __name__ == "__main__":
     import sys
 